@@ -1,5 +1,4 @@
 from pydantic_settings import BaseSettings
-from functools import lru_cache
 
 
 class Settings(BaseSettings):
@@ -10,15 +9,33 @@ class Settings(BaseSettings):
     tavily_api_key: str
 
     # Database
+    # Each uvicorn worker has its own pool: keep
+    # db_pool_max_size * workers below the server's max_connections
     database_url: str
+    db_pool_min_size: int = 2
+    db_pool_max_size: int = 10
+    db_command_timeout: float = 60
+    db_statement_cache_size: int = 1024
+    db_max_inactive_connection_lifetime: float = 300
 
     # Model Configuration
     llm_model: str = "llama-3.3-70b-versatile"
+    # Concurrent non-streaming Groq requests per worker (planner and answers)
+    groq_max_concurrency: int = 8
+    # Concurrent open Groq streams per worker; held for the whole stream
+    groq_max_streams: int = 32
 
     # Document Processing
     max_document_size_mb: int = 50
     chunk_size: int = 1000
     chunk_overlap: int = 200
+    # A document still 'processing' after this long is treated as a crashed
+    # ingestion: it no longer blocks re-uploads of the same file
+    processing_stale_after_s: int = 900
+
+    # Conversation history (in-memory, per worker)
+    conversation_cache_size: int = 10000
+    conversation_ttl_seconds: int = 3600
 
     # API Configuration
     api_host: str = "0.0.0.0"
@@ -29,7 +46,10 @@ class Settings(BaseSettings):
         env_file_encoding = "utf-8"
 
 
-@lru_cache()
+# Validated once at import; every module shares this instance
+settings = Settings()
+
+
 def get_settings() -> Settings:
-    """Get cached settings instance"""
-    return Settings()
+    """Get the application settings instance"""
+    return settings
@@ -2,7 +2,9 @@
 
 import asyncio
 import asyncpg
-from typing import Optional, List, Union
+import orjson
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, List, Union
 from app.config import get_settings
 
 settings = get_settings()
@@ -11,15 +13,36 @@ settings = get_settings()
 _pool: Optional[asyncpg.Pool] = None
 
 
+def _encode_json(value) -> str:
+    """Serialize a Python value for a json/jsonb parameter"""
+    return orjson.dumps(value).decode()
+
+
+async def _init_connection(conn: asyncpg.Connection):
+    """Per-connection setup: (de)serialize json/jsonb with orjson"""
+    for typename in ("json", "jsonb"):
+        await conn.set_type_codec(
+            typename,
+            encoder=_encode_json,
+            decoder=orjson.loads,
+            schema="pg_catalog",
+        )
+
+
 async def get_pool() -> asyncpg.Pool:
     """Get or create the database connection pool"""
     global _pool
     if _pool is None:
         _pool = await asyncpg.create_pool(
             settings.database_url,
-            min_size=2,
-            max_size=10,
-            command_timeout=60,
+            min_size=settings.db_pool_min_size,
+            max_size=settings.db_pool_max_size,
+            command_timeout=settings.db_command_timeout,
+            # Prepared statements are cached per connection, keyed by SQL text
+            statement_cache_size=settings.db_statement_cache_size,
+            max_inactive_connection_lifetime=settings.db_max_inactive_connection_lifetime,
+            # json/jsonb columns map straight to Python objects
+            init=_init_connection,
         )
     return _pool
 
@@ -32,35 +55,49 @@ async def close_pool():
         _pool = None
 
 
+@asynccontextmanager
+async def acquire() -> AsyncIterator[asyncpg.Connection]:
+    """Acquire a pooled connection for several queries; released on exit"""
+    pool = _pool or await get_pool()
+    async with pool.acquire() as conn:
+        yield conn
+
+
 async def get_connection():
-    """Get a database connection from the pool"""
-    pool = await get_pool()
+    """Get a database connection from the pool
+
+    Deprecated: prefer ``async with acquire() as conn``, which always releases.
+    """
+    pool = _pool or await get_pool()
     return await pool.acquire()
 
 
 async def release_connection(connection: asyncpg.Connection):
-    """Release a connection back to the pool"""
-    pool = await get_pool()
-    pool.release(connection)
+    """Release a connection back to the pool
+
+    Deprecated: prefer ``async with acquire() as conn``, which always releases.
+    """
+    pool = _pool or await get_pool()
+    await pool.release(connection)
 
 
 async def execute_sql(query: str, *args) -> str:
     """Execute a SQL query and return the result"""
-    pool = await get_pool()
+    pool = _pool or await get_pool()
     async with pool.acquire() as conn:
         return await conn.execute(query, *args)
 
 
 async def fetch_sql(query: str, *args):
     """Fetch rows from a SQL query"""
-    pool = await get_pool()
+    pool = _pool or await get_pool()
     async with pool.acquire() as conn:
         return await conn.fetch(query, *args)
 
 
 async def fetchone_sql(query: str, *args):
     """Fetch a single row from a SQL query"""
-    pool = await get_pool()
+    pool = _pool or await get_pool()
     async with pool.acquire() as conn:
         return await conn.fetchrow(query, *args)
 
@@ -68,6 +105,7 @@ async def fetchone_sql(query: str, *args):
 __all__ = [
     "get_pool",
     "close_pool",
+    "acquire",
     "get_connection",
     "release_connection",
     "execute_sql",
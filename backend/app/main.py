@@ -1,30 +1,72 @@
 """Main FastAPI application"""
 
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
 from contextlib import asynccontextmanager
+from typing import Tuple
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import get_settings
 from app.models import HealthCheck
 from app.routers import documents, chat, chat_stream
-from app.database import close_pool
+from app.database import close_pool, get_pool
+from app.services.document_processor import document_processor
 from app.services.document_store import document_store
+from app.services.llm_service import llm_service
+from app.services.status_writer import status_writer
+from app.services.tavily_search import tavily_search_service
+
+
+logger = logging.getLogger(__name__)
+
+
+def setup_logging() -> Tuple[QueueHandler, QueueListener]:
+    """
+    Route application logs through a queue
+
+    Request handlers only enqueue records; formatting and the stream
+    write happen on the listener's background thread.
+    """
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(
+        logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    )
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    root = logging.getLogger()
+    root.addHandler(queue_handler)
+    root.setLevel(logging.INFO)
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return queue_handler, listener
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     # Startup
-    print("Starting up...")
+    log_handler, log_listener = setup_logging()
+    logger.info("Starting up...")
+    # Open the connection pool before serving so the first requests don't pay for it
+    await get_pool()
     # Initialize document store (creates tables if needed)
     await document_store.initialize()
-    print("Document store initialized")
+    logger.info("Document store initialized")
+    await tavily_search_service.warmup()
     yield
     # Shutdown
-    print("Shutting down...")
+    logger.info("Shutting down...")
+    await document_processor.aclose()
+    await status_writer.aclose()
+    await llm_service.aclose()
+    await tavily_search_service.aclose()
     await close_pool()
-    print("Database connections closed")
+    logger.info("Database connections closed")
+    logging.getLogger().removeHandler(log_handler)
+    log_listener.stop()
 
 
 # Create FastAPI app
@@ -89,5 +131,9 @@ if __name__ == "__main__":
     import uvicorn
 
     uvicorn.run(
-        "app.main:app", host=settings.api_host, port=settings.api_port, reload=True
+        "app.main:app",
+        host=settings.api_host,
+        port=settings.api_port,
+        reload=True,
+        log_level="info",
     )
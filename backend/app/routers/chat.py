@@ -1,29 +1,35 @@
 """Chat router - handles question answering"""
 
-import re
+import logging
 import uuid
 import time
-from typing import Dict, List
-from datetime import datetime
+from typing import List
+from datetime import datetime, timezone
 
+from cachetools import TTLCache
 from fastapi import APIRouter, HTTPException
 
-from app.models import ChatRequest, ChatResponse, ChatMessage, Source, SourceType
-from app.services.document_store import document_store
-from app.services.tavily_search import tavily_search_service
+from app.config import get_settings
+from app.models import ChatRequest, ChatResponse, ChatMessage
 from app.services.llm_service import llm_service
+from app.services.retrieval import retrieval_service
 
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-# In-memory conversation store (thread isolation - each thread is independent)
-conversations: Dict[str, List[ChatMessage]] = {}
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
 
+# In-memory conversation store (thread isolation - each thread is independent)
+# Bounded with a TTL so idle threads are evicted instead of growing forever
+conversations: TTLCache[str, List[ChatMessage]] = TTLCache(
+    maxsize=settings.conversation_cache_size,
+    ttl=settings.conversation_ttl_seconds,
+)
 
-def detect_urls(message: str) -> List[str]:
-    """Extract URLs from user message"""
-    url_pattern = r'https?://[^\s<>"{}|\\^`\[\]]+'
-    return re.findall(url_pattern, message)
+# Only the most recent messages are sent to the planner/LLM
+HISTORY_WINDOW = 10
 
 
 @router.post("/", response_model=ChatResponse)
@@ -46,68 +52,31 @@ async def chat(request: ChatRequest):
     thread_doc_ids = request.doc_ids if request.doc_ids is not None else []
 
     try:
-        # Get or create conversation (isolated per thread)
+        # Load recent history for this conversation (isolated per thread)
         conversation_id = request.conversation_id or str(uuid.uuid4())
-        if conversation_id not in conversations:
-            conversations[conversation_id] = []
+        history = conversations.get(conversation_id, [])[-HISTORY_WINDOW:]
+        now = datetime.now(timezone.utc)
 
-        print(f"[CHAT] conversation_id: {conversation_id}")
-        print(f"[CHAT] doc_ids received: {request.doc_ids}")
-        print(f"[CHAT] thread_doc_ids: {thread_doc_ids}")
+        logger.debug("conversation_id: %s", conversation_id)
+        logger.debug("doc_ids received: %s", request.doc_ids)
+        logger.debug("thread_doc_ids: %s", thread_doc_ids)
 
-        # Add user message to THIS conversation only
+        # User message is recorded together with the answer at the end of the turn
         user_message = ChatMessage(
-            role="user", content=request.message, timestamp=datetime.utcnow()
+            role="user", content=request.message, timestamp=now
         )
-        conversations[conversation_id].append(user_message)
-
-        # PRIORITY 1: URL extract OR freshness-triggered web search
-        urls = detect_urls(request.message)
-        web_sources = []
-        use_web_search = False
-        planner_query = request.message
-
-        if urls:
-            # User pasted a URL - fetch and process it
-            web_sources = tavily_search_service.extract(urls=urls)
-        else:
-            planner_use_web, planner_query = llm_service.plan_web_search(
-                query=request.message,
-                conversation_history=conversations[conversation_id][:-1],
-                has_uploaded_documents=bool(thread_doc_ids),
-            )
-            use_web_search = request.force_web_search or planner_use_web
-            if use_web_search:
-                web_sources = tavily_search_service.search(
-                    query=planner_query if planner_query else request.message,
-                    n_results=request.max_web_sources,
-                )
-
-        # PRIORITY 2: Search internal documents (thread-specific only)
-        # Only search documents uploaded to THIS thread via doc_ids
-        search_kwargs = {
-            "query": request.message,
-            "n_results": request.max_internal_sources,
-            "doc_ids": thread_doc_ids,
-        }
-
-        internal_sources = await document_store.search(**search_kwargs)
-
-        # Filter and combine sources
-        # For fresh-news queries with web results, suppress weak doc fallback chunks.
-        internal_threshold = 0.75 if (use_web_search and web_sources) else 0.4
-        internal_filtered = [s for s in internal_sources if s.relevance_score >= internal_threshold]
-        web_filtered = [s for s in web_sources if s.relevance_score >= 0.4]
-
-        all_sources = internal_filtered + web_filtered
-        all_sources.sort(key=lambda x: x.relevance_score, reverse=True)
+
+        internal_filtered, web_filtered, _ = await retrieval_service.retrieve(request, history)
+        # Only the sources the LLM is given are returned to the client
+        context_internal = llm_service.select_context_sources(internal_filtered)
+        all_sources = retrieval_service.merge_sources(context_internal, web_filtered)
 
         # Generate response
-        answer = llm_service.generate_response(
+        answer = await llm_service.generate_response(
             query=request.message,
             internal_sources=internal_filtered,
             web_sources=web_filtered,
-            conversation_history=conversations[conversation_id][:-1],  # Only THIS conversation's history
+            conversation_history=history,  # Only THIS conversation's history
             has_uploaded_documents=bool(thread_doc_ids),
         )
 
@@ -116,11 +85,13 @@ async def chat(request: ChatRequest):
             internal_sources=internal_filtered, web_sources=web_filtered
         )
 
-        # Add assistant message to THIS conversation only
+        # Record the turn in THIS conversation only, in a single write
         assistant_message = ChatMessage(
-            role="assistant", content=answer, timestamp=datetime.utcnow()
+            role="assistant", content=answer, timestamp=datetime.now(timezone.utc)
         )
-        conversations[conversation_id].append(assistant_message)
+        messages = conversations.get(conversation_id, [])
+        messages.extend((user_message, assistant_message))
+        conversations[conversation_id] = messages  # re-inserting also refreshes the TTL
 
         # Calculate processing time
         processing_time_ms = int((time.time() - start_time) * 1000)
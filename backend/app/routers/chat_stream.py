@@ -1,48 +1,47 @@
 """Streaming chat router - handles SSE streaming for real-time responses"""
 
-import json
-import re
+import logging
 import time
 import uuid
-from typing import Dict, List, AsyncIterator
-from datetime import datetime
+from typing import AsyncIterator
+from datetime import datetime, timezone
 
+import orjson
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
 from starlette.background import BackgroundTask
 
-from app.models import ChatRequest, ChatMessage, Source, SourceType
-from app.services.document_store import document_store
-from app.services.tavily_search import tavily_search_service
+from app.models import ChatRequest, ChatMessage
 from app.services.llm_service import llm_service
+from app.services.retrieval import retrieval_service
 
 
 router = APIRouter(prefix="/chat", tags=["chat-stream"])
 
+logger = logging.getLogger(__name__)
+
 # In-memory conversation store (shared with non-streaming chat router)
 # Import from chat router to keep state consistent
-from app.routers.chat import conversations
-
+from app.routers.chat import HISTORY_WINDOW, conversations
 
-def detect_urls(message: str) -> List[str]:
-    """Extract URLs from user message"""
-    url_pattern = r'https?://[^\s<>"{}|\\^`\[\]]+'
-    return re.findall(url_pattern, message)
+# Token events are batched: flush after this many tokens or this much time
+TOKEN_FLUSH_SIZE = 8
+TOKEN_FLUSH_INTERVAL_S = 0.02
 
 
-def format_sse(event: str, data: dict) -> str:
+def format_sse(event: str, data: dict) -> bytes:
     """Format data as Server-Sent Event"""
-    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
 
 
-async def stream_chat_generator(request: ChatRequest) -> AsyncIterator[str]:
+async def stream_chat_generator(request: ChatRequest) -> AsyncIterator[bytes]:
     """
     Generator function for SSE streaming
 
     Event types:
     - metadata: Initial metadata (conversation_id, timestamp)
     - sources: Retrieved sources (sent before LLM generation)
-    - token: Individual text tokens from LLM
+    - token: Text from LLM (consecutive tokens may be batched into one event)
     - done: Final event with full response and usage stats
     - error: Error information
 
@@ -59,106 +58,79 @@ async def stream_chat_generator(request: ChatRequest) -> AsyncIterator[str]:
     thread_doc_ids = request.doc_ids if request.doc_ids is not None else []
 
     try:
-        # Get or create conversation (thread isolation - each thread has its own history)
+        # Load recent history (thread isolation - each thread has its own history)
         conversation_id = request.conversation_id or str(uuid.uuid4())
-        if conversation_id not in conversations:
-            conversations[conversation_id] = []
+        history = conversations.get(conversation_id, [])[-HISTORY_WINDOW:]
+        now = datetime.now(timezone.utc)
 
         # Send metadata event
         yield format_sse("metadata", {
             "conversation_id": conversation_id,
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": now.isoformat(),
         })
 
-        # Add user message to THIS conversation's history only
+        # User message is recorded together with the answer at the end of the turn
         user_message = ChatMessage(
-            role="user", content=request.message, timestamp=datetime.utcnow()
+            role="user", content=request.message, timestamp=now
         )
-        conversations[conversation_id].append(user_message)
-
-        # PRIORITY 1: URL extract OR freshness-triggered web search
-        urls = detect_urls(request.message)
-        web_sources = []
-        use_web_search = False
-        planner_query = request.message
-
-        if urls:
-            # User pasted a URL - fetch and process it
-            web_sources = tavily_search_service.extract(urls=urls)
-        else:
-            planner_use_web, planner_query = llm_service.plan_web_search(
-                query=request.message,
-                conversation_history=conversations[conversation_id][:-1],
-                has_uploaded_documents=bool(thread_doc_ids),
-            )
-            use_web_search = request.force_web_search or planner_use_web
-            if use_web_search:
-                web_sources = tavily_search_service.search(
-                    query=planner_query if planner_query else request.message,
-                    n_results=request.max_web_sources,
-                )
-
-        # PRIORITY 2: Search internal documents (thread-specific)
-        # Only search documents that were uploaded to THIS thread (doc_ids)
-        search_kwargs = {
-            "query": request.message,
-            "n_results": request.max_internal_sources,
-            "doc_ids": thread_doc_ids,
-        }
-
-        internal_sources = await document_store.search(**search_kwargs)
-        print(f"[CHAT_STREAM] internal_sources count: {len(internal_sources)}")
-        if internal_sources:
-            print(f"[CHAT_STREAM] first source: {internal_sources[0].document_name}, score: {internal_sources[0].relevance_score}")
-
-        # Combine sources
-        all_sources = []
-        # For fresh-news queries with web results, suppress weak doc fallback chunks.
-        internal_threshold = 0.75 if (use_web_search and web_sources) else 0.4
-        internal_filtered = [s for s in internal_sources if s.relevance_score >= internal_threshold]
-        web_filtered = [s for s in web_sources if s.relevance_score >= 0.4]
-
-        print(f"[CHAT_STREAM] internal_filtered count: {len(internal_filtered)}")
-        print(f"[CHAT_STREAM] web_filtered count: {len(web_filtered)}")
-
-        all_sources = internal_filtered + web_filtered
-        all_sources.sort(key=lambda x: x.relevance_score, reverse=True)
+
+        internal_filtered, web_filtered, _ = await retrieval_service.retrieve(request, history)
+        # Only the sources the LLM is given are returned to the client
+        context_internal = llm_service.select_context_sources(internal_filtered)
+        all_sources = retrieval_service.merge_sources(context_internal, web_filtered)
 
         # Send sources event (BEFORE LLM generation)
-        sources_data = [llm_service.source_to_dict(s) for s in all_sources]
+        # Snippet sizes are tallied here for the usage estimate in the done event
+        sources_data = []
+        snippet_chars = 0
+        for s in all_sources:
+            sources_data.append(s.model_dump(mode="json"))
+            snippet_chars += len(s.snippet)
         yield format_sse("sources", {
             "sources": sources_data,
-            "internal_count": len(internal_filtered),
+            "internal_count": len(context_internal),
             "web_count": len(web_filtered),
         })
 
-        # Stream LLM response token by token
+        # Stream LLM response, coalescing tokens into fewer SSE frames
+        token_buffer = []
+        last_flush = time.monotonic()
         async for token in llm_service.stream_response(
             query=request.message,
             internal_sources=internal_filtered,
             web_sources=web_filtered,
-            conversation_history=conversations[conversation_id][:-1],  # Only THIS conversation's history
+            conversation_history=history,  # Only THIS conversation's history
             has_uploaded_documents=bool(thread_doc_ids),
         ):
             full_response += token
-            yield format_sse("token", {"content": token})
+            token_buffer.append(token)
+            tick = time.monotonic()
+            if len(token_buffer) >= TOKEN_FLUSH_SIZE or tick - last_flush >= TOKEN_FLUSH_INTERVAL_S:
+                yield format_sse("token", {"content": "".join(token_buffer)})
+                token_buffer.clear()
+                last_flush = tick
+
+        if token_buffer:
+            yield format_sse("token", {"content": "".join(token_buffer)})
 
         # Calculate confidence score
         confidence_score = llm_service.calculate_confidence_score(
             internal_sources=internal_filtered, web_sources=web_filtered
         )
 
-        # Add assistant message to THIS conversation only
+        # Record the turn in THIS conversation only, in a single write
         assistant_message = ChatMessage(
-            role="assistant", content=full_response, timestamp=datetime.utcnow()
+            role="assistant", content=full_response, timestamp=datetime.now(timezone.utc)
         )
-        conversations[conversation_id].append(assistant_message)
+        messages = conversations.get(conversation_id, [])
+        messages.extend((user_message, assistant_message))
+        conversations[conversation_id] = messages  # re-inserting also refreshes the TTL
 
         # Calculate processing time
         processing_time_ms = int((time.time() - start_time) * 1000)
 
         # Estimate token usage (rough approximation: ~4 chars per token)
-        estimated_input_tokens = len(request.message) // 4 + sum(len(s.snippet) for s in all_sources) // 4
+        estimated_input_tokens = (len(request.message) + snippet_chars) >> 2
         estimated_output_tokens = len(full_response) // 4
 
         # Send done event with full response
@@ -214,8 +186,10 @@ async def chat_stream(request: ChatRequest):
         stream_chat_generator(request),
         media_type="text/event-stream",
         headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
+            # no-transform/identity stop proxies from gzipping (and so buffering) the stream;
+            # no Connection header, which is illegal under HTTP/2
+            "Cache-Control": "no-cache, no-transform",
+            "Content-Encoding": "identity",
             "X-Accel-Buffering": "no",  # Disable nginx buffering
         },
     )
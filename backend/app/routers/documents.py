@@ -2,7 +2,10 @@
 
 import uuid
 import shutil
+import hashlib
 import asyncio
+import logging
+import tempfile
 from datetime import datetime
 from pathlib import Path
 from typing import List
@@ -17,11 +20,20 @@ from app.models import (
 )
 from app.services.document_processor import document_processor
 from app.services.document_store import document_store
+from app.services.status_writer import status_writer
 from app.config import get_settings
 
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
+logger = logging.getLogger(__name__)
+
+_DOC_TYPES = {t.value: t for t in DocumentType}
+_DOC_STATUSES = {s.value: s for s in DocumentStatus}
+
+# Uploads are copied to disk in blocks of this size instead of read whole
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 
 @router.post("/upload", response_model=DocumentResponse)
 async def upload_document(
@@ -35,27 +47,53 @@ async def upload_document(
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
 
-    # Check file size
-    content = await file.read()
-    file_size_mb = len(content) / (1024 * 1024)
-    if file_size_mb > settings.max_document_size_mb:
-        raise HTTPException(
-            status_code=413,
-            detail=f"File too large. Max size is {settings.max_document_size_mb}MB, got {file_size_mb:.1f}MB",
-        )
-
     # Generate document ID
     doc_id = str(uuid.uuid4())
     doc_type = document_processor.get_document_type(file.filename)
 
-    print(f"[UPLOAD] doc_id: {doc_id}, filename: {file.filename}, type: {doc_type}")
+    # Stream the upload to disk, enforcing the size limit as bytes arrive
+    max_bytes = settings.max_document_size_mb * 1024 * 1024
+    doc_dir = document_processor.documents_dir / doc_id
+    doc_dir.mkdir(exist_ok=True)
+    total = 0
+    hasher = hashlib.blake2b(digest_size=32)
+    with tempfile.NamedTemporaryFile(dir=doc_dir, prefix=".upload-", delete=False) as tmp:
+        filepath = Path(tmp.name)
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                total += len(chunk)
+                if total > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large. Max size is {settings.max_document_size_mb}MB",
+                    )
+                hasher.update(chunk)
+                # A slow disk would otherwise stall the event loop (and every
+                # other user's token stream) once per block
+                await asyncio.to_thread(tmp.write, chunk)
+        except BaseException:
+            tmp.close()
+            shutil.rmtree(doc_dir, ignore_errors=True)
+            raise
+
+    # Add document to database, unless identical content was already ingested
+    # (or is being ingested) - then reuse that one
+    try:
+        existing = await document_store.add_unique_document(
+            doc_id=doc_id,
+            filename=file.filename,
+            doc_type=doc_type.value,
+            content_hash=hasher.digest(),
+        )
+    except BaseException:
+        # Nothing references the staged file yet, so nothing else would remove it
+        shutil.rmtree(doc_dir, ignore_errors=True)
+        raise
+    if existing:
+        shutil.rmtree(doc_dir, ignore_errors=True)
+        return _document_response(existing)
 
-    # Add document to database
-    await document_store.add_document(
-        doc_id=doc_id,
-        filename=file.filename,
-        doc_type=doc_type.value,
-    )
+    logger.info("upload doc_id=%s filename=%s type=%s", doc_id, file.filename, doc_type.value)
 
     # Create initial document record
     doc_record = DocumentResponse(
@@ -67,11 +105,9 @@ async def upload_document(
         created_at=datetime.utcnow(),
     )
 
-    print(f"[UPLOAD] returning doc_id: {doc_id}")
-
     # Process document in background
     background_tasks.add_task(
-        _process_document_background, doc_id, content, file.filename
+        _process_document_background, doc_id, filepath, file.filename
     )
 
     return doc_record
@@ -123,20 +159,7 @@ async def list_documents():
     """List all uploaded documents"""
     docs = await document_store.list_documents()
 
-    document_responses = []
-    for doc in docs:
-        document_responses.append(
-            DocumentResponse(
-                id=doc["id"],
-                filename=doc["filename"],
-                doc_type=DocumentType(doc["doc_type"]),
-                source=doc.get("source"),
-                status=DocumentStatus(doc.get("status", "completed")),
-                chunk_count=doc.get("chunk_count", 0),
-                created_at=datetime.fromisoformat(doc["created_at"]) if doc.get("created_at") else datetime.utcnow(),
-                updated_at=datetime.fromisoformat(doc["updated_at"]) if doc.get("updated_at") else None,
-            )
-        )
+    document_responses = [_document_response(doc) for doc in docs]
 
     return DocumentListResponse(documents=document_responses, total=len(document_responses))
 
@@ -144,29 +167,18 @@ async def list_documents():
 @router.get("/{doc_id}", response_model=DocumentResponse)
 async def get_document(doc_id: str):
     """Get a specific document by ID"""
-    docs = await document_store.list_documents()
-    doc = next((d for d in docs if d["id"] == doc_id), None)
+    doc = await document_store.get_document(doc_id)
 
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    return DocumentResponse(
-        id=doc["id"],
-        filename=doc["filename"],
-        doc_type=DocumentType(doc["doc_type"]),
-        source=doc.get("source"),
-        status=DocumentStatus(doc.get("status", "completed")),
-        chunk_count=doc.get("chunk_count", 0),
-        created_at=datetime.fromisoformat(doc["created_at"]) if doc.get("created_at") else datetime.utcnow(),
-        updated_at=datetime.fromisoformat(doc["updated_at"]) if doc.get("updated_at") else None,
-    )
+    return _document_response(doc)
 
 
 @router.delete("/{doc_id}")
 async def delete_document(doc_id: str):
     """Delete a document and its chunks"""
-    docs = await document_store.list_documents()
-    doc = next((d for d in docs if d["id"] == doc_id), None)
+    doc = await document_store.get_document(doc_id)
 
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
@@ -185,117 +197,80 @@ async def delete_document(doc_id: str):
 @router.get("/stats/overview")
 async def get_stats():
     """Get document statistics"""
-    total_docs = await document_store.get_document_count()
-    total_chunks = await document_store.get_chunk_count()
-
-    # Get all documents for status breakdown
-    docs = await document_store.list_documents()
-    status_counts = {}
-    for doc in docs:
-        status = doc.get("status", "completed")
-        status_counts[status] = status_counts.get(status, 0) + 1
+    stats = await document_store.get_stats()
 
     return {
-        "total_documents": total_docs,
-        "total_chunks": total_chunks,
-        "status_breakdown": status_counts,
+        "total_documents": stats["total_documents"],
+        "total_chunks": stats["total_chunks"],
+        "status_breakdown": stats["status_breakdown"],
     }
 
 
-async def _process_document_background(doc_id: str, content: bytes, filename: str):
-    """Background task to process document"""
-    from app.database import execute_sql, fetchone_sql
-    
+def _document_response(doc: dict) -> DocumentResponse:
+    """Build the API response for a document record from the store"""
+    # Rows come from our own table, so skip validation and map enums by dict lookup
+    return DocumentResponse.model_construct(
+        id=doc["id"],
+        filename=doc["filename"],
+        doc_type=_DOC_TYPES[doc["doc_type"]],
+        source=doc.get("source"),
+        status=_DOC_STATUSES[doc.get("status") or "completed"],
+        chunk_count=doc.get("chunk_count") or 0,
+        created_at=doc.get("created_at") or datetime.utcnow(),
+        updated_at=doc.get("updated_at"),
+    )
+
+
+async def _process_document_background(doc_id: str, filepath: Path, filename: str):
+    """Background task to process an uploaded document staged at filepath"""
+    completed = False
     try:
-        print(f"[PROCESS] Starting processing for doc_id: {doc_id}")
-        
-        # Update status to processing (in case it's stuck)
-        await execute_sql(
-            """UPDATE documents SET status = 'processing', updated_at = NOW() WHERE id = $1""",
-            doc_id
+        logger.info("processing started doc_id=%s", doc_id)
+
+        # Extraction is CPU-bound; keep it off the event loop
+        status, chunks, error = await asyncio.to_thread(
+            document_processor.process_file, filepath, filename, doc_id
         )
-        
-        # Process file
-        status, chunks, error = document_processor.process_file(
-            content, filename, doc_id
+        logger.info(
+            "processed doc_id=%s status=%s chunks=%d error=%s",
+            doc_id, status.value, len(chunks) if chunks else 0, error,
         )
-        print(f"[PROCESS] doc_id: {doc_id}, status: {status}, chunks: {len(chunks) if chunks else 0}, error: {error}")
 
-        # Add to vector store if successful
+        # Add to vector store if successful (this marks the document completed)
         if status == DocumentStatus.COMPLETED and chunks:
             await document_store.add_document_chunks(doc_id, chunks)
-            print(f"[PROCESS] doc_id: {doc_id} - chunks added successfully")
+            completed = True
+            logger.info("chunks stored doc_id=%s", doc_id)
         else:
-            # Update document status to failed
-            await execute_sql(
-                """
-                UPDATE documents
-                SET status = $1, updated_at = NOW()
-                WHERE id = $2
-                """,
-                "failed",
-                doc_id,
-            )
-            print(f"[PROCESS] doc_id: {doc_id} - processing failed: {error}")
-
-    except Exception as e:
-        # Update document status to failed
-        await execute_sql(
-            """
-            UPDATE documents
-            SET status = 'failed', updated_at = NOW()
-            WHERE id = $1
-            """,
-            doc_id,
-        )
-        print(f"Error processing document {doc_id}: {e}")
-    
-    # Ensure status is always updated (completed or failed)
+            logger.warning("processing failed doc_id=%s error=%s", doc_id, error)
+
+    except Exception:
+        logger.exception("error processing document doc_id=%s", doc_id)
+
     finally:
-        # Double-check status is not stuck at processing
-        row = await fetchone_sql(
-            "SELECT status FROM documents WHERE id = $1",
-            doc_id,
-        )
-        if row and row['status'] == 'processing':
-            print(f"[PROCESS] WARNING: doc_id {doc_id} still processing, setting to failed")
-            await execute_sql(
-                "UPDATE documents SET status = 'failed', updated_at = NOW() WHERE id = $1",
-                doc_id,
-            )
+        # The staged upload has been moved into place (or is no longer needed)
+        filepath.unlink(missing_ok=True)
+        if not completed:
+            await status_writer.set_status(doc_id, DocumentStatus.FAILED.value)
 
 
 async def _process_url_background(doc_id: str, url: str):
     """Background task to process URL"""
+    completed = False
     try:
-        # Process URL
-        status, chunks, error = document_processor.process_url(url, doc_id)
+        status, chunks, error = await document_processor.process_url(url, doc_id)
 
-        # Add to vector store if successful
+        # Add to vector store if successful (this marks the document completed)
         if status == DocumentStatus.COMPLETED and chunks:
             await document_store.add_document_chunks(doc_id, chunks)
+            completed = True
         else:
-            # Update document status to failed
-            from app.database import execute_sql
-            await execute_sql(
-                """
-                UPDATE documents
-                SET status = 'failed', updated_at = NOW()
-                WHERE id = $1
-                """,
-                "failed",
-                doc_id,
-            )
-
-    except Exception as e:
-        # Update document status to failed
-        from app.database import execute_sql
-        await execute_sql(
-            """
-            UPDATE documents
-            SET status = 'failed', updated_at = NOW()
-            WHERE id = $1
-            """,
-            doc_id,
-        )
-        print(f"Error processing URL {doc_id}: {e}")
+            logger.warning("processing failed doc_id=%s error=%s", doc_id, error)
+
+    except Exception:
+        logger.exception("error processing URL doc_id=%s", doc_id)
+
+    finally:
+        if not completed:
+            await status_writer.set_status(doc_id, DocumentStatus.FAILED.value)
+
@@ -1,14 +1,23 @@
 """Simple document storage using PostgreSQL full-text search."""
 
-import json
+import asyncio
+import logging
 import re
 from typing import Any, Dict, List, Optional
 
-from app.database import execute_sql, fetch_sql, fetchone_sql
+import asyncpg
+
+from app.config import get_settings
+from app.database import acquire, execute_sql, fetch_sql, fetchone_sql
 from app.models import Source, SourceType
 from app.services.document_processor import DocumentChunk
 
 
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+
 _STOP_WORDS = {
     "a",
     "an",
@@ -69,6 +78,141 @@ _STOP_WORDS = {
 }
 
 
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_MAX_QUERY_TERMS = 12
+
+# Relevance assigned to chunks returned without a lexical match
+_FALLBACK_SCORE = 0.45
+
+# pg_advisory lock key guarding schema setup (ASCII "QARG")
+_SCHEMA_LOCK_KEY = 0x51415247
+
+# True once every object created by _migrate exists and every superseded one is gone
+SCHEMA_CURRENT_SQL = """
+    SELECT
+        to_regclass('document_chunks_tsv_idx') IS NOT NULL
+        AND to_regclass('documents_status_idx') IS NOT NULL
+        AND to_regclass('documents_content_hash_key') IS NOT NULL
+        AND to_regclass('document_chunks_content_idx') IS NULL
+        AND to_regclass('document_chunks_doc_id_idx') IS NULL
+        AND to_regclass('documents_content_hash_idx') IS NULL
+"""
+
+# Search statements return a snippet (first 500 chars) rather than the full chunk,
+# so long chunks are not shipped over the wire only to be cut in Python.
+# Statement text is kept in module constants so every call sends byte-identical SQL:
+# asyncpg prepares each distinct text once per pooled connection and reuses the plan
+# from its statement cache (see db_statement_cache_size) on later calls.
+UPSERT_DOCUMENT_SQL = """
+    INSERT INTO documents (id, filename, doc_type, source, content_hash)
+    VALUES ($1, $2, $3, $4, $5)
+    ON CONFLICT (id) DO UPDATE SET
+        filename = EXCLUDED.filename,
+        doc_type = EXCLUDED.doc_type,
+        source = EXCLUDED.source,
+        content_hash = EXCLUDED.content_hash,
+        updated_at = NOW()
+"""
+
+UPSERT_CHUNK_SQL = """
+    INSERT INTO document_chunks (id, doc_id, chunk_index, content, metadata)
+    VALUES ($1, $2, $3, $4, $5)
+    ON CONFLICT (doc_id, chunk_index) DO UPDATE SET
+        content = EXCLUDED.content,
+        metadata = EXCLUDED.metadata
+"""
+
+# Inserts unless live content with the same hash exists (documents_content_hash_key);
+# returns the new id, or no row on conflict
+INSERT_UNIQUE_DOCUMENT_SQL = """
+    INSERT INTO documents (id, filename, doc_type, source, content_hash)
+    VALUES ($1, $2, $3, $4, $5)
+    ON CONFLICT (content_hash) WHERE status <> 'failed' DO NOTHING
+    RETURNING id
+"""
+
+# A crashed ingestion leaves its row in 'processing'. Once stale it is failed and its
+# hash cleared, so a worker that does finish late can't clash with the re-upload.
+EXPIRE_STALE_BY_HASH_SQL = """
+    UPDATE documents
+    SET status = 'failed', content_hash = NULL, updated_at = NOW()
+    WHERE content_hash = $1
+      AND status = 'processing'
+      AND updated_at < NOW() - make_interval(secs => $2)
+"""
+
+FIND_BY_HASH_SQL = """
+    SELECT id, filename, doc_type, source, status, chunk_count, created_at, updated_at
+    FROM documents
+    WHERE content_hash = $1
+      AND status <> 'failed'
+      AND NOT (status = 'processing' AND updated_at < NOW() - make_interval(secs => $2))
+"""
+
+COMPLETE_DOCUMENT_SQL = """
+    UPDATE documents
+    SET chunk_count = $1, status = 'completed', updated_at = NOW()
+    WHERE id = $2
+"""
+
+SEARCH_SQL = """
+    SELECT
+        dc.id,
+        dc.doc_id,
+        dc.chunk_index,
+        CASE
+            WHEN char_length(dc.content) > 500 THEN substring(dc.content for 500) || '...'
+            ELSE dc.content
+        END AS snippet,
+        dc.metadata,
+        d.filename,
+        d.source,
+        CASE
+            WHEN dc.content ILIKE '%' || $1 || '%' THEN 1.0
+            ELSE 0.7
+        END as rank_score
+    FROM document_chunks dc
+    JOIN documents d ON dc.doc_id = d.id
+    CROSS JOIN to_tsquery('english', $3) q
+    WHERE ($2::text[] IS NULL OR dc.doc_id = ANY($2::text[]))
+      AND (
+        dc.content_tsv @@ q
+        OR dc.content ILIKE '%' || $1 || '%'
+      )
+      AND (
+        CASE
+            WHEN dc.content ILIKE '%' || $1 || '%' THEN 1.0
+            ELSE 0.7
+        END
+      ) >= $5::float8
+    ORDER BY
+        rank_score DESC,
+        ts_rank_cd(dc.content_tsv, q) DESC,
+        dc.chunk_index ASC
+    LIMIT $4
+"""
+
+FETCH_FALLBACK_SQL = """
+    SELECT
+        dc.id,
+        dc.doc_id,
+        dc.chunk_index,
+        CASE
+            WHEN char_length(dc.content) > 500 THEN substring(dc.content for 500) || '...'
+            ELSE dc.content
+        END AS snippet,
+        dc.metadata,
+        d.filename,
+        d.source,
+        $3::float8 as rank_score
+    FROM document_chunks dc
+    JOIN documents d ON dc.doc_id = d.id
+    WHERE dc.doc_id = ANY($1::text[])
+    ORDER BY dc.doc_id ASC, dc.chunk_index ASC
+    LIMIT $2
+"""
+
+
 class SimpleDocumentStore:
     """Simple document store using PostgreSQL full-text search."""
 
@@ -76,10 +220,33 @@ class SimpleDocumentStore:
         self._initialized = False
 
     async def initialize(self):
-        """Initialize database tables."""
+        """Initialize database tables.
+
+        Runs at app startup; public methods only fall back to it (without an
+        extra await once initialized) when used outside the app, e.g. in tests.
+        """
         if self._initialized:
             return
 
+        async with acquire() as conn:
+            # DDL takes ACCESS EXCLUSIVE locks, so an up-to-date schema is left alone
+            if not await conn.fetchval(SCHEMA_CURRENT_SQL):
+                # Every app worker (and test process) runs this at startup. The lock
+                # makes them migrate one at a time: IF NOT EXISTS DDL races otherwise.
+                # It is released when the transaction ends, error or not.
+                async with conn.transaction():
+                    await conn.execute("SELECT pg_advisory_xact_lock($1)", _SCHEMA_LOCK_KEY)
+                    # Whoever held the lock before us may have done the work
+                    if not await conn.fetchval(SCHEMA_CURRENT_SQL):
+                        await self._migrate()
+
+        self._initialized = True
+        logger.info("Simple document store initialized")
+
+    async def _migrate(self):
+        """Create or update tables and indexes."""
+        # Each phase depends on the one before; statements within a phase run
+        # concurrently on separate pooled connections.
         await execute_sql(
             """
             CREATE TABLE IF NOT EXISTS documents (
@@ -95,36 +262,96 @@ class SimpleDocumentStore:
         """
         )
 
+        await asyncio.gather(
+            execute_sql(
+                """
+                CREATE TABLE IF NOT EXISTS document_chunks (
+                    id TEXT PRIMARY KEY,
+                    doc_id TEXT NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+                    chunk_index INTEGER NOT NULL,
+                    content TEXT NOT NULL,
+                    metadata JSONB,
+                    created_at TIMESTAMPTZ DEFAULT NOW(),
+                    UNIQUE(doc_id, chunk_index)
+                );
+            """
+            ),
+            execute_sql(
+                """
+                ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_hash BYTEA;
+            """
+            ),
+        )
+
+        # Stored tsvector: computed once per insert, shared by matching and ranking
         await execute_sql(
             """
-            CREATE TABLE IF NOT EXISTS document_chunks (
-                id TEXT PRIMARY KEY,
-                doc_id TEXT NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
-                chunk_index INTEGER NOT NULL,
-                content TEXT NOT NULL,
-                metadata JSONB,
-                created_at TIMESTAMPTZ DEFAULT NOW(),
-                UNIQUE(doc_id, chunk_index)
-            );
+            ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS content_tsv tsvector
+            GENERATED ALWAYS AS (to_tsvector('english', content)) STORED;
         """
         )
+        # Superseded by document_chunks_tsv_idx on the stored column
+        await execute_sql("DROP INDEX IF EXISTS document_chunks_content_idx;")
+        # Redundant: the UNIQUE(doc_id, chunk_index) index already serves doc_id
+        # lookups and the fallback query's ORDER BY doc_id, chunk_index
+        await execute_sql("DROP INDEX IF EXISTS document_chunks_doc_id_idx;")
+        # Superseded by the partial unique documents_content_hash_key
+        await execute_sql("DROP INDEX IF EXISTS documents_content_hash_idx;")
+
+        await asyncio.gather(
+            execute_sql(
+                """
+                CREATE INDEX IF NOT EXISTS document_chunks_tsv_idx
+                ON document_chunks USING gin(content_tsv);
+            """
+            ),
+            execute_sql(
+                """
+                CREATE INDEX IF NOT EXISTS documents_status_idx
+                ON documents(status);
+            """
+            ),
+            self._create_content_hash_index(),
+            self._create_trigram_index(),
+        )
 
+    async def _create_content_hash_index(self):
+        """Create the unique index that makes content-hash dedup atomic."""
+        # Rows from before the constraint may share a hash; keep it on the oldest
         await execute_sql(
             """
-            CREATE INDEX IF NOT EXISTS document_chunks_content_idx
-            ON document_chunks USING gin(to_tsvector('english', content));
+            UPDATE documents d
+            SET content_hash = NULL
+            WHERE d.content_hash IS NOT NULL
+              AND d.status <> 'failed'
+              AND EXISTS (
+                SELECT 1 FROM documents o
+                WHERE o.content_hash = d.content_hash
+                  AND o.status <> 'failed'
+                  AND (o.created_at, o.id) < (d.created_at, d.id)
+              );
         """
         )
-
         await execute_sql(
             """
-            CREATE INDEX IF NOT EXISTS document_chunks_doc_id_idx
-            ON document_chunks(doc_id);
+            CREATE UNIQUE INDEX IF NOT EXISTS documents_content_hash_key
+            ON documents(content_hash) WHERE status <> 'failed';
         """
         )
 
-        self._initialized = True
-        print("Simple document store initialized")
+    async def _create_trigram_index(self):
+        """Create the trigram index that serves the leading-wildcard phrase ILIKE in search."""
+        try:
+            await execute_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+            await execute_sql(
+                """
+                CREATE INDEX IF NOT EXISTS document_chunks_content_trgm_idx
+                ON document_chunks USING gin(content gin_trgm_ops);
+            """
+            )
+        except asyncpg.PostgresError as e:
+            # Search still works without it, just with a sequential scan for phrases
+            logger.warning("pg_trgm unavailable, phrase search is unindexed: %s", e)
 
     async def add_document(
         self,
@@ -132,63 +359,112 @@ class SimpleDocumentStore:
         filename: str,
         doc_type: str,
         source: Optional[str] = None,
+        content_hash: Optional[bytes] = None,
     ) -> bool:
         """Add document metadata."""
-        await self.initialize()
+        if not self._initialized:
+            await self.initialize()
 
         await execute_sql(
-            """
-            INSERT INTO documents (id, filename, doc_type, source)
-            VALUES ($1, $2, $3, $4)
-            ON CONFLICT (id) DO UPDATE SET
-                filename = EXCLUDED.filename,
-                doc_type = EXCLUDED.doc_type,
-                source = EXCLUDED.source,
-                updated_at = NOW()
-            """,
+            UPSERT_DOCUMENT_SQL,
             doc_id,
             filename,
             doc_type,
             source,
+            content_hash,
         )
         return True
 
+    async def add_unique_document(
+        self,
+        doc_id: str,
+        filename: str,
+        doc_type: str,
+        content_hash: bytes,
+        source: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Add document metadata unless a live document has identical file content.
+
+        The check and insert are one atomic statement, so concurrent uploads of
+        the same file can't both be ingested.
+
+        Returns:
+            The existing document, or None if this one was added
+        """
+        if not self._initialized:
+            await self.initialize()
+
+        stale_after = float(settings.processing_stale_after_s)
+        async with acquire() as conn:
+            # A conflicting row can fail between the insert and the lookup;
+            # the insert then succeeds on the next pass
+            for _ in range(3):
+                async with conn.transaction():
+                    await conn.execute(EXPIRE_STALE_BY_HASH_SQL, content_hash, stale_after)
+                    inserted = await conn.fetchval(
+                        INSERT_UNIQUE_DOCUMENT_SQL,
+                        doc_id,
+                        filename,
+                        doc_type,
+                        source,
+                        content_hash,
+                    )
+                    if inserted is not None:
+                        return None
+                    row = await conn.fetchrow(FIND_BY_HASH_SQL, content_hash, stale_after)
+                if row:
+                    return self._row_to_document(row)
+
+        raise RuntimeError(f"could not add or find document for content hash of {doc_id}")
+
+    async def find_document_by_hash(self, content_hash: bytes) -> Optional[Dict[str, Any]]:
+        """Find a processed or in-flight document with identical file content."""
+        if not self._initialized:
+            await self.initialize()
+
+        # Failed and stale in-flight ingestions are ignored so re-uploading retries them
+        row = await fetchone_sql(
+            FIND_BY_HASH_SQL,
+            content_hash,
+            float(settings.processing_stale_after_s),
+        )
+        return self._row_to_document(row) if row else None
+
     async def add_document_chunks(
         self,
         doc_id: str,
         chunks: List[DocumentChunk],
     ) -> bool:
         """Add document chunks WITHOUT embeddings."""
-        await self.initialize()
+        if not self._initialized:
+            await self.initialize()
 
         if not chunks:
             return True
 
-        for chunk in chunks:
-            await execute_sql(
-                """
-                INSERT INTO document_chunks (id, doc_id, chunk_index, content, metadata)
-                VALUES ($1, $2, $3, $4, $5)
-                ON CONFLICT (doc_id, chunk_index) DO UPDATE SET
-                    content = EXCLUDED.content,
-                    metadata = EXCLUDED.metadata
-                """,
+        records = [
+            (
                 chunk.id,
                 doc_id,
                 chunk.metadata.get("chunk_index", 0),
                 chunk.content,
-                json.dumps(chunk.metadata),
+                chunk.metadata,  # encoded by the pool's jsonb codec
             )
+            for chunk in chunks
+        ]
 
-        await execute_sql(
-            "UPDATE documents SET chunk_count = $1, updated_at = NOW() WHERE id = $2",
-            len(chunks),
-            doc_id,
-        )
-        await execute_sql(
-            "UPDATE documents SET status = 'completed', updated_at = NOW() WHERE id = $1",
-            doc_id,
-        )
+        # One connection and transaction for the whole batch instead of a round-trip per chunk
+        async with acquire() as conn:
+            async with conn.transaction():
+                await conn.executemany(
+                    UPSERT_CHUNK_SQL,
+                    records,
+                )
+                await conn.execute(
+                    COMPLETE_DOCUMENT_SQL,
+                    len(chunks),
+                    doc_id,
+                )
 
         return True
 
@@ -200,131 +476,56 @@ class SimpleDocumentStore:
         score_threshold: float = 0.0,
     ) -> List[Source]:
         """Search chunks using query text and optional thread document filtering."""
-        await self.initialize()
+        if not self._initialized:
+            await self.initialize()
 
         query_text = (query or "").strip()
         query_terms = self._extract_query_terms(query_text)
 
-        print(f"[SEARCH] query: {query_text}")
-        print(f"[SEARCH] doc_ids: {doc_ids}")
-        print(f"[SEARCH] n_results: {n_results}")
-        print(f"[SEARCH] query_terms: {query_terms}")
+        logger.debug("query: %s", query_text)
+        logger.debug("doc_ids: %s", doc_ids)
+        logger.debug("n_results: %d", n_results)
+        logger.debug("query_terms: %s", query_terms)
 
-        rows: List[Dict[str, Any]] = []
-        if doc_ids is not None:
-            if len(doc_ids) == 0:
-                print("[SEARCH] empty doc_ids provided; returning no internal sources")
-                return []
+        # Prefix-match any term; served by the GIN index on the stored content_tsv column.
+        # Terms are [a-z0-9]+ only, so they can't inject tsquery syntax.
+        # NULL (no terms) leaves only the trigram-indexed phrase match.
+        tsquery = " | ".join(f"{term}:*" for term in query_terms) or None
 
-            debug_chunks = await fetch_sql(
-                """
-                SELECT doc_id, COUNT(*) as chunk_count
-                FROM document_chunks
-                WHERE doc_id = ANY($1::text[])
-                GROUP BY doc_id
-                """,
-                doc_ids,
-            )
-            print(f"[SEARCH] chunks found: {debug_chunks}")
+        if doc_ids is not None and len(doc_ids) == 0:
+            logger.debug("empty doc_ids provided; returning no internal sources")
+            return []
 
+        # One statement for both cases: NULL doc_ids searches every document
+        rows: List[Dict[str, Any]] = []
+        if query_text:
             rows = await fetch_sql(
-                """
-                SELECT
-                    dc.id,
-                    dc.doc_id,
-                    dc.chunk_index,
-                    dc.content,
-                    dc.metadata,
-                    d.filename,
-                    d.source,
-                    CASE
-                        WHEN dc.content ILIKE '%' || $1 || '%' THEN 1.0
-                        ELSE 0.7
-                    END as rank_score
-                FROM document_chunks dc
-                JOIN documents d ON dc.doc_id = d.id
-                WHERE dc.doc_id = ANY($2::text[])
-                  AND (
-                    dc.content ILIKE '%' || $1 || '%'
-                    OR EXISTS (
-                        SELECT 1
-                        FROM unnest($3::text[]) AS term
-                        WHERE dc.content ILIKE '%' || term || '%'
-                    )
-                  )
-                ORDER BY rank_score DESC, dc.chunk_index ASC
-                LIMIT $4
-                """,
+                SEARCH_SQL,
                 query_text,
                 doc_ids,
-                query_terms,
+                tsquery,
                 n_results,
+                score_threshold,
             )
 
-            # Broad prompts ("tell me about this document") often have no lexical overlap.
-            # In that case, send first chunks from selected docs so the LLM still has context.
-            if not rows:
-                print("[SEARCH] no lexical match, using fallback chunks from selected docs")
-                rows = await self._fetch_fallback_chunks(doc_ids=doc_ids, n_results=n_results)
-        else:
-            rows = await fetch_sql(
-                """
-                SELECT
-                    dc.id,
-                    dc.doc_id,
-                    dc.chunk_index,
-                    dc.content,
-                    dc.metadata,
-                    d.filename,
-                    d.source,
-                    CASE
-                        WHEN dc.content ILIKE '%' || $1 || '%' THEN 1.0
-                        ELSE 0.7
-                    END as rank_score
-                FROM document_chunks dc
-                JOIN documents d ON dc.doc_id = d.id
-                WHERE dc.content ILIKE '%' || $1 || '%'
-                   OR EXISTS (
-                       SELECT 1
-                       FROM unnest($2::text[]) AS term
-                       WHERE dc.content ILIKE '%' || term || '%'
-                   )
-                ORDER BY rank_score DESC, dc.chunk_index ASC
-                LIMIT $3
-                """,
-                query_text,
-                query_terms,
-                n_results,
-            )
+        # Broad prompts ("tell me about this document") often have no lexical overlap.
+        # In that case, send first chunks from selected docs so the LLM still has context.
+        if not rows and doc_ids and score_threshold <= _FALLBACK_SCORE:
+            logger.debug("no lexical match, using fallback chunks from selected docs")
+            rows = await self._fetch_fallback_chunks(doc_ids=doc_ids, n_results=n_results)
 
         sources = self._rows_to_sources(rows)
-        if score_threshold > 0:
-            sources = [s for s in sources if s.relevance_score >= score_threshold]
 
-        print(f"[SEARCH] sources returned: {len(sources)}")
+        logger.debug("sources returned: %d", len(sources))
         return sources
 
     async def _fetch_fallback_chunks(self, doc_ids: List[str], n_results: int) -> List[Dict[str, Any]]:
         """Fetch deterministic chunks from selected docs when lexical matching returns nothing."""
         return await fetch_sql(
-            """
-            SELECT
-                dc.id,
-                dc.doc_id,
-                dc.chunk_index,
-                dc.content,
-                dc.metadata,
-                d.filename,
-                d.source,
-                0.45 as rank_score
-            FROM document_chunks dc
-            JOIN documents d ON dc.doc_id = d.id
-            WHERE dc.doc_id = ANY($1::text[])
-            ORDER BY dc.doc_id ASC, dc.chunk_index ASC
-            LIMIT $2
-            """,
+            FETCH_FALLBACK_SQL,
             doc_ids,
             n_results,
+            _FALLBACK_SCORE,
         )
 
     def _rows_to_sources(self, rows: List[Dict[str, Any]]) -> List[Source]:
@@ -332,19 +533,11 @@ class SimpleDocumentStore:
         sources: List[Source] = []
         for row in rows:
             metadata = row.get("metadata") or {}
-            if isinstance(metadata, str):
-                try:
-                    metadata = json.loads(metadata)
-                except json.JSONDecodeError:
-                    metadata = {}
-
-            content = row.get("content") or ""
-            snippet = content[:500] + "..." if len(content) > 500 else content
             source = Source(
                 source_type=SourceType.INTERNAL_DOCUMENT,
                 document_id=row.get("doc_id"),
                 document_name=row.get("filename") or metadata.get("source", "Unknown"),
-                snippet=snippet,
+                snippet=row.get("snippet") or "",
                 relevance_score=float(row.get("rank_score", 0.8)),
             )
             sources.append(source)
@@ -352,14 +545,16 @@ class SimpleDocumentStore:
 
     def _extract_query_terms(self, query: str) -> List[str]:
         """Extract normalized terms used for substring matching."""
-        tokens = re.findall(r"[a-z0-9]+", query.lower())
         terms: List[str] = []
-        for token in tokens:
-            if len(token) < 3 or token in _STOP_WORDS:
+        seen = set()
+        for token in _TOKEN_RE.findall(query.lower()):
+            if len(token) < 3 or token in _STOP_WORDS or token in seen:
                 continue
-            if token not in terms:
-                terms.append(token)
-        return terms[:12]
+            seen.add(token)
+            terms.append(token)
+            if len(terms) == _MAX_QUERY_TERMS:
+                break
+        return terms
 
     async def delete_document(self, doc_id: str) -> bool:
         """Delete a document and all its chunks."""
@@ -367,16 +562,6 @@ class SimpleDocumentStore:
         await execute_sql("DELETE FROM documents WHERE id = $1;", doc_id)
         return True
 
-    async def get_document_count(self) -> int:
-        """Get total number of documents."""
-        row = await fetchone_sql("SELECT COUNT(*) as count FROM documents;")
-        return row["count"] if row else 0
-
-    async def get_chunk_count(self) -> int:
-        """Get total number of chunks."""
-        row = await fetchone_sql("SELECT COUNT(*) as count FROM document_chunks;")
-        return row["count"] if row else 0
-
     async def list_documents(self) -> List[Dict[str, Any]]:
         """List all documents."""
         rows = await fetch_sql(
@@ -386,19 +571,43 @@ class SimpleDocumentStore:
             ORDER BY created_at DESC;
             """
         )
-        return [
-            {
-                "id": row["id"],
-                "filename": row["filename"],
-                "doc_type": row["doc_type"],
-                "source": row["source"],
-                "status": row["status"],
-                "chunk_count": row["chunk_count"],
-                "created_at": row["created_at"].isoformat() if row["created_at"] else None,
-                "updated_at": row["updated_at"].isoformat() if row["updated_at"] else None,
-            }
-            for row in rows
-        ]
+        return [self._row_to_document(row) for row in rows]
+
+    async def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Get a single document by ID, or None if it does not exist."""
+        row = await fetchone_sql(
+            """
+            SELECT id, filename, doc_type, source, status, chunk_count, created_at, updated_at
+            FROM documents
+            WHERE id = $1;
+            """,
+            doc_id,
+        )
+        return self._row_to_document(row) if row else None
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get document/chunk totals and the per-status breakdown in one round-trip."""
+        row = await fetchone_sql(
+            """
+            SELECT
+                (SELECT COUNT(*) FROM documents) AS total_documents,
+                (SELECT COUNT(*) FROM document_chunks) AS total_chunks,
+                (
+                    SELECT json_object_agg(status, count)
+                    FROM (SELECT status, COUNT(*) AS count FROM documents GROUP BY status) s
+                ) AS status_breakdown;
+            """
+        )
+        return {
+            "total_documents": row["total_documents"],
+            "total_chunks": row["total_chunks"],
+            # json_object_agg is NULL when there are no documents
+            "status_breakdown": row["status_breakdown"] or {},
+        }
+
+    def _row_to_document(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a documents row to a dict (timestamps stay native datetimes)."""
+        return dict(row)
 
 
 document_store = SimpleDocumentStore()
@@ -1,12 +1,153 @@
 """Groq LLM service with lazy initialization and streaming support"""
 
+import asyncio
+import hashlib
+import heapq
 import json
+import logging
 import re
 from typing import List, Optional, AsyncIterator, Tuple
-from groq import Groq
+from cachetools import TTLCache
+from groq import AsyncGroq
 
 from app.config import get_settings
 from app.models import Source, ChatMessage
+from app.utils import detect_urls
+
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+# Ceiling on in-flight Groq requests so a burst of chats queues here instead of
+# saturating outbound connections and degrading latency for everyone
+_GROQ_SEM = asyncio.Semaphore(settings.groq_max_concurrency)
+# Streams get their own ceiling: each one keeps its connection busy until the
+# client has read the last token, so sharing _GROQ_SEM would let a few slow
+# readers starve planner and non-streaming calls
+_GROQ_STREAM_SEM = asyncio.Semaphore(settings.groq_max_streams)
+
+# Freshness cues used when the planner call fails (one alternation, one scan)
+_FRESHNESS_RE = re.compile(
+    "|".join(
+        [
+            r"\btoday'?s?\b",
+            r"\b(latest|current|recent|breaking|live)\b",
+            r"\b(news|headline|headlines|update|updates)\b",
+            r"\b(as of|right now)\b",
+            r"\b(this week|this month|this year)\b",
+        ]
+    )
+)
+
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+# Upper bound on internal document sources placed in the prompt (bounds input tokens)
+MAX_CTX_SOURCES = 10
+
+# Planner decisions are deterministic (temperature=0); reuse them for repeated turns.
+# A TTL rather than a plain LRU so "latest news" style routing is re-checked.
+_PLAN_CACHE: TTLCache[tuple, Tuple[bool, str]] = TTLCache(maxsize=1024, ttl=300)
+
+
+def _history_digest(history: List[ChatMessage]) -> bytes:
+    """Fixed-size digest of (role, content) pairs, so cache keys don't pin long answers"""
+    hasher = hashlib.blake2b(digest_size=16)
+    for msg in history:
+        # Length-prefixed so message boundaries can't shift between pairs
+        for part in (msg.role, msg.content or ""):
+            data = part.encode()
+            hasher.update(len(data).to_bytes(8, "little"))
+            hasher.update(data)
+    return hasher.digest()
+
+
+# Fixed prompt text lives at module scope; only the query/context are formatted in per turn
+_PLANNER_PROMPT = """You are a routing assistant for a RAG system.
+Decide if this user query requires a live web search tool.
+
+Use web search when:
+- The query asks for today/current/latest/recent/breaking information
+- The user asks for real-time facts like news, market, weather, schedule, or "as of now"
+- Uploaded documents are unlikely to have the up-to-date answer
+
+Do NOT use web search when:
+- The user asks to summarize/explain uploaded documents
+- The answer is likely stable and already in provided documents/history
+
+Return ONLY minified JSON with keys:
+{"use_web_search": boolean, "search_query": string}
+
+Rules:
+- If use_web_search is true, rewrite search_query to be clear and web-search friendly
+- If false, set search_query to the original user query"""
+
+_SYSTEM_PROMPT = """You are QARAG, an intelligent document assistant. You help users by answering questions based on uploaded documents and, when relevant, from web sources.
+
+## Core Rules:
+
+1. Document-First Retrieval:
+   - Always ground your answers in the documents provided
+   - Cite sources explicitly as [Source: filename] when using document content
+   - Format responses in clean markdown
+
+2. Response Formatting:
+   - Use proper markdown: headers (##, ###), bullet points, numbered lists, **bold** for emphasis
+   - Keep responses concise, structured, and actionable
+   - NEVER use emojis in your responses
+   - Do NOT expose internal system details like "no context provided" or "vector store"
+
+3. Current/Fresh Questions:
+   - If the question is about current events (today/latest/current news), prioritize web sources when they are available
+   - Include explicit dates and days when asked
+
+4. Empty State Behavior:
+   - If no documents are available and user asks a document-specific question, respond:
+     "No documents are uploaded to this chat yet. Upload a document to get context-aware answers, or ask me a general question."
+   - For general questions without documents, answer helpfully using general knowledge
+
+5. Source Attribution:
+   - Every answer derived from documents must include source references
+   - Format inline citations as: [Source: filename.pdf]
+   - Group related information from the same source
+
+6. When Context is Insufficient:
+   - Clearly state what information is available and what isn't
+   - Don't make up facts that aren't in the context
+   - Suggest what the user could upload to get better answers
+
+Remember: Be helpful, professional, and concise. Never use emojis."""
+
+_USER_MSG_WITH_CTX = """### Retrieved Context:
+{context}
+
+### User Question:
+{query}
+
+### Instructions:
+- Answer based on the provided context above
+- Cite sources inline when using information
+- Use markdown formatting (headers, bullet points, bold for emphasis)
+- If the context doesn't fully answer the question, say so clearly"""
+
+_USER_MSG_DOCS_NO_MATCH = """### User Question:
+{query}
+
+### Instructions:
+- Documents are uploaded in this chat, but no strong text match was retrieved for this question
+- Do NOT say that no documents are uploaded
+- Ask a brief clarifying follow-up or offer to summarize the uploaded document
+- If useful, provide a best-effort answer and clearly label uncertainty
+- Use markdown formatting"""
+
+_USER_MSG_GENERAL = """### User Question:
+{query}
+
+### Instructions:
+- This is a general question with no uploaded documents
+- Answer helpfully based on your general knowledge
+- Use markdown formatting
+- Be concise and helpful"""
 
 
 class LLMService:
@@ -18,29 +159,25 @@ class LLMService:
 
     @property
     def client(self):
-        """Lazy initialization of Groq client"""
+        """Lazy initialization of the async Groq client"""
         if self._client is None:
-            settings = get_settings()
-            print("Initializing Groq client...")
-            self._client = Groq(api_key=settings.groq_api_key)
+            logger.info("Initializing Groq client")
+            self._client = AsyncGroq(api_key=settings.groq_api_key)
             self._model = settings.llm_model
-            print("Groq client initialized")
         return self._client
 
     @property
     def model(self):
         """Get model name"""
         if self._model is None:
-            settings = get_settings()
             self._model = settings.llm_model
         return self._model
 
     def detect_urls(self, message: str) -> List[str]:
         """Extract URLs from user message"""
-        url_pattern = r'https?://[^\s<>"{}|\\^`\[\]]+'
-        return re.findall(url_pattern, message)
+        return detect_urls(message)
 
-    def plan_web_search(
+    async def plan_web_search(
         self,
         query: str,
         conversation_history: Optional[List[ChatMessage]] = None,
@@ -52,31 +189,22 @@ class LLMService:
         Returns:
             Tuple of (use_web_search, search_query)
         """
-        fallback_use, fallback_query = self._heuristic_web_search_plan(query)
-
-        planner_prompt = """You are a routing assistant for a RAG system.
-Decide if this user query requires a live web search tool.
-
-Use web search when:
-- The query asks for today/current/latest/recent/breaking information
-- The user asks for real-time facts like news, market, weather, schedule, or "as of now"
-- Uploaded documents are unlikely to have the up-to-date answer
-
-Do NOT use web search when:
-- The user asks to summarize/explain uploaded documents
-- The answer is likely stable and already in provided documents/history
+        # The planner only sees the last 3 history messages, so they are part of the key
+        history_tail = _history_digest((conversation_history or [])[-3:])
+        cache_key = (" ".join(query.lower().split()), has_uploaded_documents, history_tail)
+        cached = _PLAN_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
 
-Return ONLY minified JSON with keys:
-{"use_web_search": boolean, "search_query": string}
-
-Rules:
-- If use_web_search is true, rewrite search_query to be clear and web-search friendly
-- If false, set search_query to the original user query"""
+        fallback_use, fallback_query = self._heuristic_web_search_plan(query)
 
-        messages = [{"role": "system", "content": planner_prompt}]
+        messages = [{"role": "system", "content": _PLANNER_PROMPT}]
         if conversation_history:
-            for msg in conversation_history[-3:]:
-                messages.append({"role": msg.role, "content": msg.content})
+            messages.extend(
+                {"role": msg.role, "content": msg.content}
+                for msg in conversation_history[-3:]
+                if msg.content
+            )
 
         user_context = "has_uploaded_documents=true" if has_uploaded_documents else "has_uploaded_documents=false"
         messages.append(
@@ -87,14 +215,15 @@ Rules:
         )
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0,
-                max_completion_tokens=200,
-                top_p=1,
-                stream=False,
-            )
+            async with _GROQ_SEM:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0,
+                    max_completion_tokens=200,
+                    top_p=1,
+                    stream=False,
+                )
             content = (response.choices[0].message.content or "").strip()
             decision = self._extract_json_dict(content)
             if not decision:
@@ -105,24 +234,18 @@ Rules:
             if not search_query:
                 search_query = query
 
+            # Only real planner decisions are cached, never the heuristic fallback
+            _PLAN_CACHE[cache_key] = (use_web_search, search_query)
             return use_web_search, search_query
 
-        except Exception as e:
-            print(f"Web search planner error: {e}")
+        except Exception:
+            logger.exception("Web search planner error")
             return fallback_use, fallback_query
 
     def _heuristic_web_search_plan(self, query: str) -> Tuple[bool, str]:
         """Fallback decision when planner model call fails."""
         text = (query or "").strip()
-        lower = text.lower()
-        patterns = [
-            r"\btoday'?s?\b",
-            r"\b(latest|current|recent|breaking|live)\b",
-            r"\b(news|headline|headlines|update|updates)\b",
-            r"\b(as of|right now)\b",
-            r"\b(this week|this month|this year)\b",
-        ]
-        use_web_search = any(re.search(pattern, lower) for pattern in patterns)
+        use_web_search = _FRESHNESS_RE.search(text.lower()) is not None
         return use_web_search, text
 
     def _extract_json_dict(self, text: str) -> Optional[dict]:
@@ -136,7 +259,7 @@ Rules:
         except json.JSONDecodeError:
             pass
 
-        match = re.search(r"\{.*\}", text, re.DOTALL)
+        match = _JSON_OBJECT_RE.search(text)
         if not match:
             return None
 
@@ -146,7 +269,7 @@ Rules:
         except json.JSONDecodeError:
             return None
 
-    def generate_response(
+    async def generate_response(
         self,
         query: str,
         internal_sources: List[Source],
@@ -167,111 +290,72 @@ Rules:
         Returns:
             Generated response
         """
-        # Build system prompt
-        system_prompt = self._build_system_prompt()
-
-        # Build context from sources
-        context, has_context = self._build_context(internal_sources, web_sources)
-
-        # Build messages with proper typing
-        messages = [{"role": "system", "content": system_prompt}]
-
-        # Add conversation history
-        if conversation_history:
-            for msg in conversation_history[-5:]:  # Last 5 messages
-                messages.append({"role": msg.role, "content": msg.content})
-
-        # Build user message with context
-        if has_context:
-            user_message = f"""### Retrieved Context:
-{context}
-
-### User Question:
-{query}
-
-### Instructions:
-- Answer based on the provided context above
-- Cite sources inline when using information
-- Use markdown formatting (headers, bullet points, bold for emphasis)
-- If the context doesn't fully answer the question, say so clearly"""
-        else:
-            if has_uploaded_documents:
-                user_message = f"""### User Question:
-{query}
-
-### Instructions:
-- Documents are uploaded in this chat, but no strong text match was retrieved for this question
-- Do NOT say that no documents are uploaded
-- Ask a brief clarifying follow-up or offer to summarize the uploaded document
-- If useful, provide a best-effort answer and clearly label uncertainty
-- Use markdown formatting"""
-            else:
-                # No context available - general query mode
-                user_message = f"""### User Question:
-{query}
-
-### Instructions:
-- This is a general question with no uploaded documents
-- Answer helpfully based on your general knowledge
-- Use markdown formatting
-- Be concise and helpful"""
-
-        messages.append({"role": "user", "content": user_message})
+        messages = self._build_messages(
+            query, internal_sources, web_sources, conversation_history, has_uploaded_documents
+        )
 
         # Generate response
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
-                max_completion_tokens=4096,
-                top_p=1,
-                stream=False,
-            )
+            async with _GROQ_SEM:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_completion_tokens=4096,
+                    top_p=1,
+                    stream=False,
+                )
 
             return response.choices[0].message.content
 
-        except Exception as e:
-            print(f"Groq API error: {e}")
+        except Exception:
+            logger.exception("Groq API error")
             return "I apologize, but I encountered an error while generating a response. Please try again."
 
-    def _build_system_prompt(self) -> str:
-        """Build system prompt for the chatbot"""
-        return """You are QARAG, an intelligent document assistant. You help users by answering questions based on uploaded documents and, when relevant, from web sources.
-
-## Core Rules:
-
-1. Document-First Retrieval:
-   - Always ground your answers in the documents provided
-   - Cite sources explicitly as [Source: filename] when using document content
-   - Format responses in clean markdown
+    def _build_messages(
+        self,
+        query: str,
+        internal_sources: List[Source],
+        web_sources: List[Source],
+        conversation_history: Optional[List[ChatMessage]],
+        has_uploaded_documents: bool,
+    ) -> List[dict]:
+        """Build the chat messages shared by generate_response and stream_response"""
+        context, has_context = self._build_context(internal_sources, web_sources)
 
-2. Response Formatting:
-   - Use proper markdown: headers (##, ###), bullet points, numbered lists, **bold** for emphasis
-   - Keep responses concise, structured, and actionable
-   - NEVER use emojis in your responses
-   - Do NOT expose internal system details like "no context provided" or "vector store"
+        messages = [{"role": "system", "content": _SYSTEM_PROMPT}]
 
-3. Current/Fresh Questions:
-   - If the question is about current events (today/latest/current news), prioritize web sources when they are available
-   - Include explicit dates and days when asked
+        # Add conversation history (last 5 messages); empty turns would only cost tokens
+        if conversation_history:
+            messages.extend(
+                {"role": msg.role, "content": msg.content}
+                for msg in conversation_history[-5:]
+                if msg.content
+            )
 
-4. Empty State Behavior:
-   - If no documents are available and user asks a document-specific question, respond:
-     "No documents are uploaded to this chat yet. Upload a document to get context-aware answers, or ask me a general question."
-   - For general questions without documents, answer helpfully using general knowledge
+        # Build user message with context
+        if has_context:
+            user_message = _USER_MSG_WITH_CTX.format(context=context, query=query)
+        elif has_uploaded_documents:
+            user_message = _USER_MSG_DOCS_NO_MATCH.format(query=query)
+        else:
+            # No context available - general query mode
+            user_message = _USER_MSG_GENERAL.format(query=query)
 
-5. Source Attribution:
-   - Every answer derived from documents must include source references
-   - Format inline citations as: [Source: filename.pdf]
-   - Group related information from the same source
+        messages.append({"role": "user", "content": user_message})
+        return messages
 
-6. When Context is Insufficient:
-   - Clearly state what information is available and what isn't
-   - Don't make up facts that aren't in the context
-   - Suggest what the user could upload to get better answers
+    def select_context_sources(self, internal_sources: List[Source]) -> List[Source]:
+        """Pick the internal sources placed in the prompt, best first
 
-Remember: Be helpful, professional, and concise. Never use emojis."""
+        The best MAX_CTX_SOURCES, dropping low relevance ones (<40%). Routers
+        show the user this same selection, so citations match what the model saw.
+        """
+        return heapq.nlargest(
+            MAX_CTX_SOURCES,
+            (s for s in internal_sources if s.relevance_score >= 0.4),
+            key=lambda s: s.relevance_score,
+        )
 
     def _build_context(
         self, internal_sources: List[Source], web_sources: List[Source]
@@ -281,40 +365,36 @@ Remember: Be helpful, professional, and concise. Never use emojis."""
         Returns:
             Tuple of (context_string, has_context)
         """
-        print(f"[LLM] _build_context called with {len(internal_sources)} internal sources, {len(web_sources)} web sources")
-        
-        context_parts = []
-        has_context = False
-
-        # Add internal document sources
-        if internal_sources:
-            # Filter out low relevance sources (<40%)
-            filtered_sources = [s for s in internal_sources if s.relevance_score >= 0.4]
-            print(f"[LLM] filtered to {len(filtered_sources)} sources with score >= 0.4")
-
-            if filtered_sources:
-                has_context = True
-                context_parts.append("## Documents:\n")
-                for source in filtered_sources:
-                    doc_name = source.document_name or "Unknown Document"
-                    score_pct = int(source.relevance_score * 100)
-                    context_parts.append(f"### [{doc_name}] (Relevance: {score_pct}%)")
-                    context_parts.append(source.snippet)
-                    context_parts.append("")
-                print(f"[LLM] context built with {len(filtered_sources)} sources")
+        logger.debug(
+            "_build_context called with %d internal sources, %d web sources",
+            len(internal_sources), len(web_sources),
+        )
+
+        sections = []
+
+        filtered_sources = self.select_context_sources(internal_sources)
+        if filtered_sources:
+            sections.append(
+                "## Documents:\n\n"
+                + "\n".join(
+                    f"### [{s.document_name or 'Unknown Document'}] "
+                    f"(Relevance: {int(s.relevance_score * 100)}%)\n{s.snippet}\n"
+                    for s in filtered_sources
+                )
+            )
+            logger.debug("context built with %d sources", len(filtered_sources))
 
         # Add web sources
         if web_sources:
-            has_context = True
-            context_parts.append("\n## Web Sources:\n")
-            for source in web_sources:
-                url = source.url or source.document_name or "Web Source"
-                context_parts.append(f"### [{url}]")
-                context_parts.append(source.snippet)
-                context_parts.append("")
+            sections.append(
+                "\n## Web Sources:\n\n"
+                + "\n".join(
+                    f"### [{s.url or s.document_name or 'Web Source'}]\n{s.snippet}\n"
+                    for s in web_sources
+                )
+            )
 
-        context = "\n".join(context_parts) if context_parts else ""
-        return context, has_context
+        return "\n".join(sections), bool(sections)
 
     def calculate_confidence_score(
         self, internal_sources: List[Source], web_sources: List[Source]
@@ -359,86 +439,37 @@ Remember: Be helpful, professional, and concise. Never use emojis."""
         Yields:
             Response tokens as they are generated
         """
-        # Build system prompt
-        system_prompt = self._build_system_prompt()
-
-        # Build context from sources
-        context, has_context = self._build_context(internal_sources, web_sources)
-
-        # Build messages with proper typing
-        messages = [{"role": "system", "content": system_prompt}]
-
-        # Add conversation history
-        if conversation_history:
-            for msg in conversation_history[-5:]:  # Last 5 messages
-                messages.append({"role": msg.role, "content": msg.content})
-
-        # Build user message with context
-        if has_context:
-            user_message = f"""### Retrieved Context:
-{context}
-
-### User Question:
-{query}
-
-### Instructions:
-- Answer based on the provided context above
-- Cite sources inline when using information
-- Use markdown formatting (headers, bullet points, bold for emphasis)
-- If the context doesn't fully answer the question, say so clearly"""
-        else:
-            if has_uploaded_documents:
-                user_message = f"""### User Question:
-{query}
-
-### Instructions:
-- Documents are uploaded in this chat, but no strong text match was retrieved for this question
-- Do NOT say that no documents are uploaded
-- Ask a brief clarifying follow-up or offer to summarize the uploaded document
-- If useful, provide a best-effort answer and clearly label uncertainty
-- Use markdown formatting"""
-            else:
-                # No context available - general query mode
-                user_message = f"""### User Question:
-{query}
-
-### Instructions:
-- This is a general question with no uploaded documents
-- Answer helpfully based on your general knowledge
-- Use markdown formatting
-- Be concise and helpful"""
-
-        messages.append({"role": "user", "content": user_message})
+        messages = self._build_messages(
+            query, internal_sources, web_sources, conversation_history, has_uploaded_documents
+        )
 
         # Stream response
         try:
-            stream = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
-                max_completion_tokens=4096,
-                top_p=1,
-                stream=True,
-            )
-
-            for chunk in stream:
-                if chunk.choices and chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
-
-        except Exception as e:
-            print(f"Groq API streaming error: {e}")
+            # The slot is held until the stream ends: the connection is busy all along
+            async with _GROQ_STREAM_SEM:
+                # Async client, so waiting for the next token doesn't block the event loop
+                stream = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_completion_tokens=4096,
+                    top_p=1,
+                    stream=True,
+                )
+
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+
+        except Exception:
+            logger.exception("Groq API streaming error")
             yield "I apologize, but I encountered an error while generating a response. Please try again."
 
-    def source_to_dict(self, source: Source) -> dict:
-        """Convert Source model to dictionary for JSON serialization"""
-        return {
-            "source_type": source.source_type,
-            "document_id": source.document_id,
-            "document_name": source.document_name,
-            "url": source.url,
-            "snippet": source.snippet,
-            "relevance_score": source.relevance_score,
-        }
+    async def aclose(self):
+        """Close the Groq client's HTTP connections"""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
 
     def message_to_dict(self, msg: ChatMessage) -> dict:
         """Convert ChatMessage to dictionary for JSON serialization"""
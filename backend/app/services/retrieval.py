@@ -0,0 +1,117 @@
+"""Retrieval pipeline shared by the chat and streaming chat routers"""
+
+import asyncio
+import heapq
+import logging
+from typing import List, Tuple
+
+from app.models import ChatRequest, ChatMessage, Source
+from app.services.document_store import document_store
+from app.services.tavily_search import tavily_search_service
+from app.services.llm_service import llm_service
+from app.utils import detect_urls
+
+
+logger = logging.getLogger(__name__)
+
+
+class RetrievalService:
+    """Service that gathers internal and web sources for a chat turn"""
+
+    async def retrieve(
+        self, request: ChatRequest, history: List[ChatMessage]
+    ) -> Tuple[List[Source], List[Source], bool]:
+        """
+        Collect the sources for a chat request
+
+        Source Priority:
+        1. URLs in message → Tavily Extract
+        2. Uploaded documents → full-text search (thread-specific only)
+
+        Args:
+            request: Incoming chat request
+            history: Recent messages of this conversation
+
+        Returns:
+            Tuple of (internal sources, web sources ranked by score, whether web search was used)
+        """
+        # Enforce thread-scoped document filtering.
+        # Empty list means "this thread has no documents" (no global fallback).
+        thread_doc_ids = request.doc_ids if request.doc_ids is not None else []
+
+        # PRIORITY 2: Search internal documents (thread-specific only)
+        # Started now so it runs concurrently with the planner and web search
+        internal_task = asyncio.create_task(
+            document_store.search(
+                query=request.message,
+                n_results=request.max_internal_sources,
+                doc_ids=thread_doc_ids,
+                score_threshold=0.4,  # weak matches are dropped in SQL
+            )
+        )
+
+        # PRIORITY 1: URL extract OR freshness-triggered web search
+        urls = detect_urls(request.message)
+        web_sources = []
+        use_web_search = False
+        planner_query = request.message
+
+        try:
+            if urls:
+                # User pasted a URL - fetch and process it
+                web_sources = await tavily_search_service.extract(urls=urls)
+            else:
+                if request.force_web_search:
+                    # Planner decision would be ignored - skip the LLM round-trip
+                    use_web_search = True
+                else:
+                    # Recent identical planner inputs are answered from the service's cache
+                    use_web_search, planner_query = await llm_service.plan_web_search(
+                        query=request.message,
+                        conversation_history=history,
+                        has_uploaded_documents=bool(thread_doc_ids),
+                    )
+                if use_web_search:
+                    # Repeated queries are answered from the service's result cache
+                    web_sources = await tavily_search_service.search(
+                        query=planner_query if planner_query else request.message,
+                        n_results=request.max_web_sources,
+                    )
+        except BaseException:
+            internal_task.cancel()
+            raise
+
+        # Internal results don't depend on the planner or web search
+        internal_sources = await internal_task
+        logger.debug("internal_sources count: %d", len(internal_sources))
+        if internal_sources:
+            logger.debug(
+                "first source: %s, score: %s",
+                internal_sources[0].document_name,
+                internal_sources[0].relevance_score,
+            )
+
+        # For fresh-news queries with web results, suppress weak doc fallback chunks.
+        if use_web_search and web_sources:
+            internal_filtered = [s for s in internal_sources if s.relevance_score >= 0.75]
+        else:
+            internal_filtered = internal_sources
+        web_filtered = [s for s in web_sources if s.relevance_score >= 0.4]
+        web_filtered.sort(key=lambda x: x.relevance_score, reverse=True)
+
+        logger.debug("internal_filtered count: %d", len(internal_filtered))
+        logger.debug("web_filtered count: %d", len(web_filtered))
+
+        return internal_filtered, web_filtered, use_web_search
+
+    def merge_sources(
+        self, internal_sources: List[Source], web_sources: List[Source]
+    ) -> List[Source]:
+        """Merge two score-ranked source lists into one ranked list in O(n)"""
+        return list(
+            heapq.merge(internal_sources, web_sources, key=lambda x: -x.relevance_score)
+        )
+
+
+# Create instance
+retrieval_service = RetrievalService()
@@ -0,0 +1,92 @@
+"""Coalesced document status writes for background ingestion"""
+
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from app.database import execute_sql
+
+
+logger = logging.getLogger(__name__)
+
+
+class StatusWriter:
+    """Service that batches document status updates into one UPDATE per status"""
+
+    def __init__(self, max_batch: int = 500, flush_interval: float = 0.02):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        """Lazy creation of the pending-update queue"""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    async def set_status(self, doc_id: str, status: str):
+        """
+        Queue a final status for a document that is still processing
+
+        The write is applied with the next batch; documents that already
+        left 'processing' (e.g. completed) are not touched.
+        """
+        self.queue.put_nowait((doc_id, status))
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self):
+        """Drain the queue, writing updates in batches"""
+        while True:
+            batch = [await self.queue.get()]
+            # Give concurrent tasks a moment to join this batch
+            await asyncio.sleep(self.flush_interval)
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            try:
+                await self._write(batch)
+            except Exception:
+                logger.exception("failed to write %d document status updates", len(batch))
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _write(self, batch: List[Tuple[str, str]]):
+        """Issue one UPDATE per target status"""
+        by_status: Dict[str, List[str]] = {}
+        for doc_id, status in batch:
+            by_status.setdefault(status, []).append(doc_id)
+
+        for status, doc_ids in by_status.items():
+            await execute_sql(
+                """
+                UPDATE documents
+                SET status = $1, updated_at = NOW()
+                WHERE id = ANY($2::text[]) AND status = 'processing'
+                """,
+                status,
+                doc_ids,
+            )
+
+    async def aclose(self):
+        """Flush pending updates and stop the worker"""
+        if self._queue is not None:
+            await self._queue.join()
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._queue = None
+        self._worker = None
+
+
+# Create instance - the worker starts with the first queued update
+status_writer = StatusWriter()
@@ -1,29 +1,110 @@
 """Tavily web search, extract, and crawl service"""
 
-from typing import List, Optional
-from tavily import TavilyClient
+import asyncio
+import logging
+import random
+from typing import List, Optional, Tuple
+from cachetools import TTLCache
+from tavily import AsyncTavilyClient
+from tavily.errors import UsageLimitExceededError
 
 from app.config import get_settings
 from app.models import Source, SourceType
 
 
+logger = logging.getLogger(__name__)
+
+# Maximum URLs accepted by one Tavily extract request
+EXTRACT_BATCH_SIZE = 20
+
+# Rate-limited (HTTP 429) calls are retried with exponential backoff plus jitter
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_S = 0.25
+BACKOFF_MAX_S = 4.0
+
+# Shared stand-in for "no domain filter"; serialized by the SDK like an empty list
+_EMPTY: tuple = ()
+
+
+def _normalize_query(query: str) -> str:
+    """
+    Normalize a query for use as a cache key
+
+    Only case, spacing and trailing ?!. are folded, so "What is Python?" and
+    "what is python" share one cache entry. Other punctuation carries meaning
+    ("C++" vs "C#", ".NET", "3.14") and is kept.
+    """
+    return " ".join(query.lower().split()).rstrip("?!. ")
+
+
 class TavilySearchService:
     """Service for web search, extract, and crawl using Tavily API with lazy initialization"""
 
-    def __init__(self):
+    def __init__(self, cache_size: int = 512, cache_ttl: float = 120, max_concurrency: int = 64):
         self._client = None
+        # Caps in-flight requests to the Tavily API across all callers (including
+        # extract batches fanned out with gather)
+        self._sem = asyncio.Semaphore(max_concurrency)
+        # Recent results for identical calls (retries, refreshes, common questions).
+        # The TTL is short so news-style queries stay fresh. Lookups and stores
+        # happen without an await in between, so no lock is needed on one loop.
+        self._cache: TTLCache[tuple, Tuple[Source, ...]] = TTLCache(
+            maxsize=cache_size, ttl=cache_ttl
+        )
+        self.cache_hits = 0
 
     @property
     def client(self):
-        """Lazy initialization of Tavily client"""
+        """Lazy initialization of Tavily client
+
+        The async client keeps one pooled httpx connection set for the process,
+        so calls reuse TCP/TLS connections and don't block the event loop.
+        """
         if self._client is None:
             settings = get_settings()
-            print("Initializing Tavily client...")
-            self._client = TavilyClient(api_key=settings.tavily_api_key)
-            print("Tavily client initialized")
+            logger.info("Initializing Tavily client")
+            self._client = AsyncTavilyClient(api_key=settings.tavily_api_key)
         return self._client
 
-    def search(
+    async def warmup(self):
+        """Create the client at startup so the first request doesn't pay for it"""
+        # No API call: a probe search would spend credits on every deploy/restart
+        _ = self.client
+
+    async def aclose(self):
+        """Close the client's pooled connections"""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def _call(self, method: str, **kwargs) -> dict:
+        """Call a Tavily client method under the concurrency limit, backing off on 429s"""
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                async with self._sem:
+                    return await getattr(self.client, method)(**kwargs)
+            except UsageLimitExceededError:
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+                # Sleep outside the semaphore so waiting doesn't hold a slot
+                delay = min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** attempt + random.random())
+                logger.warning("Tavily rate limited on %s, retrying in %.2fs", method, delay)
+                await asyncio.sleep(delay)
+
+    def _cache_get(self, key: tuple) -> Optional[List[Source]]:
+        """Return a copy of cached sources for key, or None on a miss"""
+        sources = self._cache.get(key)
+        if sources is None:
+            return None
+        self.cache_hits += 1
+        return list(sources)
+
+    def _cache_put(self, key: tuple, sources: List[Source]):
+        """Store a snapshot of sources; empty results (often failures) aren't cached"""
+        if sources:
+            self._cache[key] = tuple(sources)
+
+    async def search(
         self,
         query: str,
         n_results: int = 3,
@@ -44,39 +125,51 @@ class TavilySearchService:
         Returns:
             List of sources
         """
+        cache_key = (
+            "search",
+            _normalize_query(query),
+            n_results,
+            search_depth,
+            tuple(include_domains or _EMPTY),
+            tuple(exclude_domains or _EMPTY),
+        )
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
             # Perform search
-            response = self.client.search(
+            response = await self._call(
+                "search",
                 query=query,
                 max_results=min(n_results, 10),
                 search_depth=search_depth,
                 include_answer=False,
                 include_raw_content=False,
                 include_images=False,
-                include_domains=include_domains or [],
-                exclude_domains=exclude_domains or [],
+                include_domains=include_domains or _EMPTY,
+                exclude_domains=exclude_domains or _EMPTY,
             )
 
             # Convert to Source objects
-            sources = []
-            for result in response.get("results", []):
-                relevance_score = result.get("score", 0.5)
-
-                source = Source(
+            sources = [
+                Source(
                     source_type=SourceType.WEB_SEARCH,
                     url=result.get("url"),
-                    snippet=result.get("content", "")[:500],
-                    relevance_score=relevance_score,
+                    snippet=(result.get("content") or "")[:500],
+                    relevance_score=result.get("score", 0.5),
                 )
-                sources.append(source)
+                for result in response.get("results", ())
+            ]
 
+            self._cache_put(cache_key, sources)
             return sources
 
-        except Exception as e:
-            print(f"Tavily search error: {e}")
+        except Exception:
+            logger.exception("Tavily search error")
             return []
 
-    def search_with_answer(
+    async def search_with_answer(
         self, query: str, n_results: int = 3, search_depth: str = "advanced"
     ) -> tuple:
         """
@@ -86,7 +179,8 @@ class TavilySearchService:
             Tuple of (answer, sources)
         """
         try:
-            response = self.client.search(
+            response = await self._call(
+                "search",
                 query=query,
                 max_results=min(n_results, 10),
                 search_depth=search_depth,
@@ -97,57 +191,75 @@ class TavilySearchService:
 
             answer = response.get("answer", "")
 
-            sources = []
-            for result in response.get("results", []):
-                source = Source(
+            sources = [
+                Source(
                     source_type=SourceType.WEB_SEARCH,
                     url=result.get("url"),
-                    snippet=result.get("content", "")[:500],
+                    snippet=(result.get("content") or "")[:500],
                     relevance_score=result.get("score", 0.5),
                 )
-                sources.append(source)
+                for result in response.get("results", ())
+            ]
 
             return answer, sources
 
-        except Exception as e:
-            print(f"Tavily search with answer error: {e}")
+        except Exception:
+            logger.exception("Tavily search with answer error")
             return "", []
 
-    def extract(self, urls: List[str]) -> List[Source]:
+    async def extract(self, urls: List[str]) -> List[Source]:
         """
         Extract content from specific URLs using Tavily
 
+        URLs are sent in batches of EXTRACT_BATCH_SIZE (the API's per-request
+        limit) and the batches run concurrently, so latency tracks the slowest
+        batch rather than their sum.
+
         Args:
             urls: List of URLs to extract content from
 
         Returns:
             List of sources with extracted content
         """
-        try:
-            response = self.client.extract(urls=urls)
-
-            sources = []
-            results = response.get("results", [])
-
-            for result in results:
-                url = result.get("url", "")
-                content = result.get("content", "")
-
-                source = Source(
+        cache_key = ("extract", tuple(urls))
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
+        batches = [
+            urls[i:i + EXTRACT_BATCH_SIZE] for i in range(0, len(urls), EXTRACT_BATCH_SIZE)
+        ]
+        responses = await asyncio.gather(
+            *(self._call("extract", urls=batch) for batch in batches),
+            return_exceptions=True,
+        )
+
+        sources = []
+        failed = False
+        for response in responses:
+            # A failed batch doesn't discard the others
+            if isinstance(response, Exception):
+                logger.error("Tavily extract error", exc_info=response)
+                failed = True
+                continue
+
+            sources.extend(
+                Source(
                     source_type=SourceType.WEB_SEARCH,
-                    url=url,
-                    snippet=content[:500] if content else "",
+                    url=result.get("url", ""),
+                    # pop: the full page body is released as soon as it is sliced
+                    snippet=(result.pop("content", None) or "")[:500],
                     relevance_score=1.0,  # Direct extraction has high relevance
                 )
-                sources.append(source)
-
-            return sources
+                for result in response.get("results", ())
+            )
 
-        except Exception as e:
-            print(f"Tavily extract error: {e}")
-            return []
+        # Partial results would hide the failed batch's URLs for the whole TTL
+        if not failed:
+            self._cache_put(cache_key, sources)
+        return sources
 
-    def crawl(self, url: str, extract_depth: str = "advanced") -> List[Source]:
+    async def crawl(self, url: str, extract_depth: str = "advanced") -> List[Source]:
         """
         Crawl a website and extract content using Tavily
 
@@ -158,28 +270,30 @@ class TavilySearchService:
         Returns:
             List of sources from crawled pages
         """
-        try:
-            response = self.client.crawl(url=url, extract_depth=extract_depth)
-
-            sources = []
-            results = response.get("results", [])
+        cache_key = ("crawl", url, extract_depth)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
 
-            for result in results:
-                crawled_url = result.get("url", "")
-                content = result.get("content", "")
+        try:
+            response = await self._call("crawl", url=url, extract_depth=extract_depth)
 
-                source = Source(
+            sources = [
+                Source(
                     source_type=SourceType.WEB_SEARCH,
-                    url=crawled_url,
-                    snippet=content[:500] if content else "",
+                    url=result.get("url", ""),
+                    # pop: the full page body is released as soon as it is sliced
+                    snippet=(result.pop("content", None) or "")[:500],
                     relevance_score=1.0,
                 )
-                sources.append(source)
+                for result in response.get("results", ())
+            ]
 
+            self._cache_put(cache_key, sources)
             return sources
 
-        except Exception as e:
-            print(f"Tavily crawl error: {e}")
+        except Exception:
+            logger.exception("Tavily crawl error")
             return []
 
 
@@ -1 +1,19 @@
-# Utils package
+"""Shared helpers used across routers and services"""
+
+import re
+from typing import List
+
+
+# Compiled once at import instead of looked up in re's cache on every message
+_URL_RE = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+')
+
+
+def detect_urls(message: str) -> List[str]:
+    """Extract URLs from user message"""
+    # Every match starts with "http"; skip the regex for the common no-URL case
+    if "http" not in message:
+        return []
+    return _URL_RE.findall(message)
+
+
+__all__ = ["detect_urls"]
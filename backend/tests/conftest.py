@@ -2,16 +2,46 @@
 
 import pytest
 import pytest_asyncio
-from app.database import get_pool, close_pool, reset_pool
+from httpx import AsyncClient, ASGITransport
+from app.database import acquire, execute_sql, get_pool, close_pool, reset_pool
+from app.main import app
 
 
-@pytest_asyncio.fixture(scope="function", autouse=True)
+@pytest_asyncio.fixture(scope="session", autouse=True)
 async def setup_db():
-    """Setup database connection pool for tests"""
-    # Reset pool state before each test
+    """Setup the database connection pool once for the whole test run"""
     reset_pool()
-    pool = await get_pool()
+    await get_pool()
     yield
     await close_pool()
-    # Reset pool state after each test
     reset_pool()
+
+
+@pytest_asyncio.fixture
+async def db_txn():
+    """Connection inside a transaction that is rolled back after the test"""
+    async with acquire() as conn:
+        tx = conn.transaction()
+        await tx.start()
+        try:
+            yield conn
+        finally:
+            await tx.rollback()
+
+
+@pytest_asyncio.fixture
+async def db_clean():
+    """Collect IDs of documents a test commits (e.g. via HTTP); deleted in one statement after"""
+    doc_ids = []
+    yield doc_ids
+    if doc_ids:
+        # Chunks go with their documents (ON DELETE CASCADE)
+        await execute_sql("DELETE FROM documents WHERE id = ANY($1::text[]);", doc_ids)
+
+
+@pytest_asyncio.fixture(scope="session")
+async def client():
+    """HTTP client for the app, shared by all tests"""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
@@ -0,0 +1,108 @@
+"""Tests for the streaming chat router (SSE framing, token coalescing, sources)"""
+
+import asyncio
+
+import orjson
+import pytest
+
+from app.models import ChatRequest, Source, SourceType
+from app.routers import chat_stream
+from app.services.llm_service import MAX_CTX_SOURCES, llm_service
+from app.services.retrieval import retrieval_service
+
+
+def parse_sse(frames):
+    """Decode SSE frames into (event, data) pairs"""
+    events = []
+    for frame in frames:
+        event_line, data_line = frame.decode().strip().split("\n")
+        events.append((event_line[len("event: "):], orjson.loads(data_line[len("data: "):])))
+    return events
+
+
+async def run_stream(message: str):
+    """Run the SSE generator to completion and return its events"""
+    request = ChatRequest(message=message)
+    return parse_sse([frame async for frame in chat_stream.stream_chat_generator(request)])
+
+
+@pytest.mark.asyncio
+async def test_tokens_flush_on_size_and_end_of_stream(monkeypatch):
+    """Full buffers are flushed as they fill and the tail goes out before 'done'"""
+    monkeypatch.setattr(chat_stream, "TOKEN_FLUSH_SIZE", 8)
+    monkeypatch.setattr(chat_stream, "TOKEN_FLUSH_INTERVAL_S", 3600)
+    tokens = [f"t{i} " for i in range(20)]
+
+    async def generate():
+        for token in tokens:
+            yield token
+
+    async def fake_retrieve(request, history):
+        return [], [], False
+
+    monkeypatch.setattr(retrieval_service, "retrieve", fake_retrieve)
+    monkeypatch.setattr(llm_service, "stream_response", lambda **kwargs: generate())
+    events = await run_stream("size flush")
+
+    names = [name for name, _ in events]
+    assert names == ["metadata", "sources", "token", "token", "token", "done"]
+    frames = [data["content"] for name, data in events if name == "token"]
+    assert frames == ["".join(tokens[:8]), "".join(tokens[8:16]), "".join(tokens[16:])]
+    assert events[-1][1]["answer"] == "".join(tokens)
+
+
+@pytest.mark.asyncio
+async def test_tokens_flush_on_interval(monkeypatch):
+    """A slow stream flushes what it has once the interval passes"""
+    monkeypatch.setattr(chat_stream, "TOKEN_FLUSH_SIZE", 1000)
+    monkeypatch.setattr(chat_stream, "TOKEN_FLUSH_INTERVAL_S", 0.01)
+
+    async def generate():
+        yield "a"
+        yield "b"
+        await asyncio.sleep(0.05)
+        yield "c"
+        yield "d"
+
+    async def fake_retrieve(request, history):
+        return [], [], False
+
+    monkeypatch.setattr(retrieval_service, "retrieve", fake_retrieve)
+    monkeypatch.setattr(llm_service, "stream_response", lambda **kwargs: generate())
+    events = await run_stream("interval flush")
+
+    frames = [data["content"] for name, data in events if name == "token"]
+    assert frames == ["abc", "d"]
+    assert events[-1][0] == "done"
+    assert events[-1][1]["answer"] == "abcd"
+
+
+@pytest.mark.asyncio
+async def test_sources_event_matches_llm_context(monkeypatch):
+    """The client is sent only the internal sources the LLM is given"""
+    internal = [
+        Source(
+            source_type=SourceType.INTERNAL_DOCUMENT,
+            document_name=f"doc{i}.txt",
+            snippet="text",
+            relevance_score=score,
+        )
+        for i, score in enumerate([0.9] * (MAX_CTX_SOURCES + 5) + [0.3])
+    ]
+
+    async def generate():
+        yield "ok"
+
+    async def fake_retrieve(request, history):
+        return internal, [], False
+
+    monkeypatch.setattr(retrieval_service, "retrieve", fake_retrieve)
+    monkeypatch.setattr(llm_service, "stream_response", lambda **kwargs: generate())
+    events = await run_stream("capped sources")
+
+    sources = dict(events)["sources"]
+    assert sources["internal_count"] == MAX_CTX_SOURCES
+    assert [s["document_name"] for s in sources["sources"]] == [
+        s.document_name for s in llm_service.select_context_sources(internal)
+    ]
+    assert all(s["relevance_score"] >= 0.4 for s in sources["sources"])
@@ -2,7 +2,7 @@
 
 import pytest
 from pgvector.asyncpg import Vector
-from app.database import execute_sql, fetch_sql, fetchone_sql
+from app.database import acquire, execute_sql, fetch_sql, fetchone_sql
 
 
 @pytest.mark.asyncio
@@ -57,17 +57,17 @@ async def test_vector_column_exists():
 
 
 @pytest.mark.asyncio
-async def test_insert_and_fetch_document():
+async def test_insert_and_fetch_document(db_txn):
     """Test inserting and fetching a document"""
-    # Insert a test document
-    await execute_sql("""
+    # Insert a test document (rolled back after the test)
+    await db_txn.execute("""
         INSERT INTO documents (id, filename, doc_type, source)
         VALUES ($1, $2, $3, $4)
         ON CONFLICT (id) DO NOTHING
     """, "test-doc-1", "test.pdf", "pdf", "test_source")
 
     # Fetch the document
-    row = await fetchone_sql("SELECT * FROM documents WHERE id = $1", "test-doc-1")
+    row = await db_txn.fetchrow("SELECT * FROM documents WHERE id = $1", "test-doc-1")
 
     assert row is not None
     assert row["filename"] == "test.pdf"
@@ -117,17 +117,16 @@ async def test_vector_similarity_search():
     embedding1 = Vector([0.1] * 5 + [0.0] * 379)
     embedding2 = Vector([0.1] * 5 + [0.0] * 379)  # Same as embedding1
 
-    await execute_sql("""
-        INSERT INTO document_chunks (id, doc_id, chunk_index, content, embedding)
-        VALUES ($1, $2, $3, $4, $5)
-        ON CONFLICT (id) DO NOTHING
-    """, "chunk-2", "test-doc-3", 0, "Similar content 1", embedding1)
-
-    await execute_sql("""
-        INSERT INTO document_chunks (id, doc_id, chunk_index, content, embedding)
-        VALUES ($1, $2, $3, $4, $5)
-        ON CONFLICT (id) DO NOTHING
-    """, "chunk-3", "test-doc-3", 1, "Similar content 2", embedding2)
+    # Both chunks in one batched statement
+    async with acquire() as conn:
+        await conn.executemany("""
+            INSERT INTO document_chunks (id, doc_id, chunk_index, content, embedding)
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (id) DO NOTHING
+        """, [
+            ("chunk-2", "test-doc-3", 0, "Similar content 1", embedding1),
+            ("chunk-3", "test-doc-3", 1, "Similar content 2", embedding2),
+        ])
 
     # Search using cosine similarity
     query_embedding = Vector([0.1] * 5 + [0.0] * 379)
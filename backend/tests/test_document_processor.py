@@ -150,5 +150,16 @@ async def test_extract_html():
     assert "script" not in text.lower() or "alert" not in text
 
 
+@pytest.mark.asyncio
+async def test_chunk_ids_are_deterministic():
+    """Re-processing the same document yields the same chunk IDs"""
+    content = b"Deterministic chunk id check. " * 100
+    _, first, _ = document_processor.process_file(content, "ids.txt", "test-doc-ids")
+    _, second, _ = document_processor.process_file(content, "ids.txt", "test-doc-ids")
+
+    assert [c.id for c in first] == [c.id for c in second]
+    assert len({c.id for c in first}) == len(first)
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -4,6 +4,7 @@ import uuid
 
 import pytest
 
+from app.database import execute_sql
 from app.services.document_processor import DocumentChunk
 from app.services.document_store import document_store
 
@@ -76,3 +77,88 @@ async def test_search_matches_multiword_query_tokens():
         assert any("Python" in source.snippet for source in results)
     finally:
         await document_store.delete_document(doc_id)
+
+
+@pytest.mark.asyncio
+async def test_get_document_by_id():
+    """Single-document lookup returns the row, or None for unknown IDs."""
+    doc_id = f"test-doc-{uuid.uuid4()}"
+    await document_store.add_document(
+        doc_id=doc_id,
+        filename="lookup.txt",
+        doc_type="text",
+    )
+
+    try:
+        doc = await document_store.get_document(doc_id)
+        assert doc is not None
+        assert doc["id"] == doc_id
+        assert doc["filename"] == "lookup.txt"
+        assert doc["status"] == "processing"
+
+        stats = await document_store.get_stats()
+        assert stats["total_documents"] >= 1
+        assert stats["total_chunks"] >= 0
+        assert stats["status_breakdown"].get("processing", 0) >= 1
+
+        assert await document_store.get_document(f"missing-{uuid.uuid4()}") is None
+    finally:
+        await document_store.delete_document(doc_id)
+
+
+@pytest.mark.asyncio
+async def test_find_document_by_hash_skips_failed():
+    """Content-hash lookup finds live documents but not failed ingestions."""
+    doc_id = f"test-doc-{uuid.uuid4()}"
+    content_hash = uuid.uuid4().bytes * 2
+    await document_store.add_document(
+        doc_id=doc_id,
+        filename="dup.txt",
+        doc_type="text",
+        content_hash=content_hash,
+    )
+
+    try:
+        doc = await document_store.find_document_by_hash(content_hash)
+        assert doc is not None
+        assert doc["id"] == doc_id
+
+        await execute_sql("UPDATE documents SET status = 'failed' WHERE id = $1", doc_id)
+        assert await document_store.find_document_by_hash(content_hash) is None
+    finally:
+        await document_store.delete_document(doc_id)
+
+
+@pytest.mark.asyncio
+async def test_add_unique_document_reuses_live_and_replaces_stale():
+    """Same content returns the live document; a stale in-flight one is replaced."""
+    doc_id = f"test-doc-{uuid.uuid4()}"
+    dup_id = f"test-doc-{uuid.uuid4()}"
+    content_hash = uuid.uuid4().bytes * 2
+
+    try:
+        assert await document_store.add_unique_document(
+            doc_id=doc_id, filename="dup.txt", doc_type="text", content_hash=content_hash
+        ) is None
+
+        existing = await document_store.add_unique_document(
+            doc_id=dup_id, filename="dup.txt", doc_type="text", content_hash=content_hash
+        )
+        assert existing is not None
+        assert existing["id"] == doc_id
+        assert await document_store.get_document(dup_id) is None
+
+        # Simulate a worker that crashed mid-processing long ago
+        await execute_sql(
+            "UPDATE documents SET updated_at = NOW() - interval '1 day' WHERE id = $1", doc_id
+        )
+        assert await document_store.find_document_by_hash(content_hash) is None
+        assert await document_store.add_unique_document(
+            doc_id=dup_id, filename="dup.txt", doc_type="text", content_hash=content_hash
+        ) is None
+        stale = await document_store.get_document(doc_id)
+        assert stale["status"] == "failed"
+    finally:
+        await execute_sql(
+            "DELETE FROM documents WHERE id = ANY($1::text[])", [doc_id, dup_id]
+        )
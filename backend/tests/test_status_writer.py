@@ -0,0 +1,76 @@
+"""Tests for batched document status writes"""
+
+import asyncio
+import uuid
+
+import pytest
+
+from app.services import status_writer as status_writer_module
+from app.services.document_processor import DocumentChunk
+from app.services.document_store import document_store
+from app.services.status_writer import StatusWriter
+
+
+@pytest.fixture
+def sql_calls(monkeypatch):
+    """Record the statements StatusWriter issues instead of running them"""
+    calls = []
+
+    async def fake_execute_sql(query, *args):
+        await asyncio.sleep(0)
+        calls.append((query, args))
+
+    monkeypatch.setattr(status_writer_module, "execute_sql", fake_execute_sql)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_set_status_coalesces_one_update_per_status(sql_calls):
+    """Concurrent updates become a single UPDATE ... ANY($2) per target status"""
+    writer = StatusWriter(flush_interval=0.01)
+
+    await asyncio.gather(
+        writer.set_status("doc-a", "failed"),
+        writer.set_status("doc-b", "completed"),
+        writer.set_status("doc-c", "failed"),
+    )
+    await writer.aclose()
+
+    assert len(sql_calls) == 2
+    assert all("ANY($2::text[])" in query for query, _ in sql_calls)
+    by_status = {args[0]: args[1] for _, args in sql_calls}
+    assert by_status == {"failed": ["doc-a", "doc-c"], "completed": ["doc-b"]}
+
+
+@pytest.mark.asyncio
+async def test_aclose_flushes_queued_updates(sql_calls):
+    """Updates still waiting for the flush interval are written before the worker stops"""
+    writer = StatusWriter(flush_interval=0.05)
+
+    await writer.set_status("doc-a", "failed")
+    assert sql_calls == []
+
+    await writer.aclose()
+
+    assert [args for _, args in sql_calls] == [("failed", ["doc-a"])]
+    assert writer._worker is None
+
+
+@pytest.mark.asyncio
+async def test_late_failed_write_keeps_completed_status():
+    """The processing guard stops a late 'failed' write from overwriting 'completed'"""
+    doc_id = f"test-doc-{uuid.uuid4()}"
+    await document_store.add_document(doc_id=doc_id, filename="done.txt", doc_type="text")
+    await document_store.add_document_chunks(
+        doc_id=doc_id, chunks=[DocumentChunk("Finished content.", {"chunk_index": 0})]
+    )
+
+    writer = StatusWriter(flush_interval=0.01)
+    try:
+        await writer.set_status(doc_id, "failed")
+        await writer.aclose()
+
+        doc = await document_store.get_document(doc_id)
+        assert doc["status"] == "completed"
+    finally:
+        await document_store.delete_document(doc_id)
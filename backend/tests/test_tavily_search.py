@@ -0,0 +1,157 @@
+"""Tests for the Tavily search service (with a stubbed client, no API calls)"""
+
+import pytest
+from tavily.errors import UsageLimitExceededError
+
+from app.services import tavily_search
+from app.services.tavily_search import EXTRACT_BATCH_SIZE, MAX_ATTEMPTS, TavilySearchService
+
+
+class FakeTavilyClient:
+    """Stand-in for AsyncTavilyClient
+
+    Search rate limits the first `failures` calls; extract times out on the
+    first `extract_failures` calls.
+    """
+
+    def __init__(self, results=None, failures=0, extract_failures=0):
+        self.results = results if results is not None else []
+        self.failures = failures
+        self.extract_failures = extract_failures
+        self.calls = 0
+        self.extract_calls = 0
+
+    async def search(self, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise UsageLimitExceededError("rate limited")
+        return {"results": [dict(r) for r in self.results]}
+
+    async def extract(self, urls):
+        self.extract_calls += 1
+        if self.extract_calls <= self.extract_failures:
+            raise TimeoutError("extract timed out")
+        return {"results": [{"url": url, "content": "page"} for url in urls]}
+
+
+def make_service(client, **kwargs) -> TavilySearchService:
+    """Service wired to a fake client"""
+    service = TavilySearchService(**kwargs)
+    service._client = client
+    return service
+
+
+@pytest.mark.asyncio
+async def test_call_retries_rate_limited_requests(monkeypatch):
+    """429s are retried with backoff outside the concurrency limit"""
+    client = FakeTavilyClient(results=[{"url": "https://a.example"}], failures=2)
+    service = make_service(client, max_concurrency=1)
+    delays = []
+
+    async def fake_sleep(delay):
+        # Backoff must not hold a concurrency slot
+        assert not service._sem.locked()
+        delays.append(delay)
+
+    monkeypatch.setattr(tavily_search.asyncio, "sleep", fake_sleep)
+
+    response = await service._call("search", query="q")
+
+    assert response["results"][0]["url"] == "https://a.example"
+    assert client.calls == 3
+    assert len(delays) == 2
+    assert all(0 < d <= tavily_search.BACKOFF_MAX_S for d in delays)
+
+
+@pytest.mark.asyncio
+async def test_call_reraises_after_max_attempts(monkeypatch):
+    """The rate limit error surfaces once every attempt has been used"""
+    client = FakeTavilyClient(failures=MAX_ATTEMPTS)
+    service = make_service(client, max_concurrency=1)
+    delays = []
+
+    async def fake_sleep(delay):
+        # Backoff must not hold a concurrency slot
+        assert not service._sem.locked()
+        delays.append(delay)
+
+    monkeypatch.setattr(tavily_search.asyncio, "sleep", fake_sleep)
+
+    with pytest.raises(UsageLimitExceededError):
+        await service._call("search", query="q")
+
+    assert client.calls == MAX_ATTEMPTS
+    assert len(delays) == MAX_ATTEMPTS - 1
+
+
+@pytest.mark.asyncio
+async def test_search_cache_hits_on_normalized_query():
+    """Queries differing only in case, spacing and a trailing '?' share a cache entry"""
+    client = FakeTavilyClient(results=[{"url": "https://a.example", "content": "A", "score": 0.9}])
+    service = make_service(client)
+
+    first = await service.search("What is Python?")
+    second = await service.search("  what is   python ")
+
+    assert client.calls == 1
+    assert service.cache_hits == 1
+    assert [s.url for s in second] == [s.url for s in first] == ["https://a.example"]
+
+
+@pytest.mark.asyncio
+async def test_search_cache_keeps_meaningful_punctuation():
+    """Queries that differ in meaningful punctuation don't share a cache entry"""
+    client = FakeTavilyClient(results=[{"url": "https://a.example"}])
+    service = make_service(client)
+
+    await service.search("C++ tutorial")
+    await service.search("C# tutorial")
+    await service.search("what is 3.14")
+    await service.search("what is 3 14")
+
+    assert client.calls == 4
+    assert service.cache_hits == 0
+
+
+@pytest.mark.asyncio
+async def test_search_counts_each_cache_hit():
+    """cache_hits counts served-from-cache calls, not misses"""
+    client = FakeTavilyClient(results=[{"url": "https://a.example"}])
+    service = make_service(client)
+
+    await service.search("python")
+    await service.search("python")
+    await service.search("python")
+    await service.search("rust")
+
+    assert client.calls == 2
+    assert service.cache_hits == 2
+
+
+@pytest.mark.asyncio
+async def test_search_does_not_cache_empty_results():
+    """Empty results (often failures) are fetched again next time"""
+    client = FakeTavilyClient(results=[])
+    service = make_service(client)
+
+    assert await service.search("python") == []
+    assert await service.search("python") == []
+
+    assert client.calls == 2
+    assert service.cache_hits == 0
+
+
+@pytest.mark.asyncio
+async def test_extract_does_not_cache_partial_results():
+    """A failed batch keeps the rest of the results out of the cache"""
+    urls = [f"https://{i}.example" for i in range(EXTRACT_BATCH_SIZE + 1)]
+    client = FakeTavilyClient(extract_failures=1)
+    service = make_service(client)
+
+    partial = await service.extract(urls)
+    full = await service.extract(urls)
+
+    assert 0 < len(partial) < len(urls)
+    assert len(full) == len(urls)
+    assert client.extract_calls == 4
+    assert service.cache_hits == 0
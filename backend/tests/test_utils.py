@@ -0,0 +1,23 @@
+"""Tests for shared utility helpers"""
+
+import pytest
+from app.utils import detect_urls
+
+
+@pytest.mark.asyncio
+async def test_detect_urls_extracts_urls():
+    """Test URL extraction from a chat message"""
+    message = "Summarize https://example.com/a?b=1 and http://test.org/page please"
+    assert detect_urls(message) == ["https://example.com/a?b=1", "http://test.org/page"]
+
+
+@pytest.mark.asyncio
+async def test_detect_urls_without_urls():
+    """Test messages without URLs (including a bare 'http' mention) return nothing"""
+    assert detect_urls("What does the uploaded report say?") == []
+    assert detect_urls("Explain how http caching works") == []
+    assert detect_urls("") == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])